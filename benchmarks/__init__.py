@@ -0,0 +1 @@
+"""Performance benchmarks for victron_ble_ha_parser."""
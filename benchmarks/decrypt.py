@@ -0,0 +1,61 @@
+"""Compare the per-packet cost of the advertisement decryption strategies.
+
+Run from the repository root with ``python -m benchmarks.decrypt``. For every
+fixture device it times victron-ble's decryption (a new CTR cipher per
+packet), the parser's _decrypt() with a cipher reused per key and
+_decrypt_many() over a batch of packets, in nanoseconds per packet.
+"""
+
+import argparse
+import sys
+import timeit
+
+from collections.abc import Callable
+
+from Crypto.Cipher import AES
+from Crypto.Util import Counter
+from Crypto.Util.Padding import pad
+
+from victron_ble_ha_parser.parser import _decrypt, _decrypt_many, _read_container
+
+from tests.fixtures import DEVICES
+
+
+def _per_packet_ns(case: Callable[[], object], number: int, packets: int = 1) -> float:
+    """Return the best time per packet over a few timed repeats."""
+    best = min(timeit.repeat(case, number=number, repeat=5))
+    return best / (number * packets) * 1e9
+
+
+def main() -> int:
+    """Print the decryption cost per packet for every fixture device."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    header = ("device", "victron-ble", "reused", "batched")
+    print("{:<24} {:>12} {:>8} {:>8}".format(*header))
+    for device_id, device in DEVICES.items():
+        key = bytes.fromhex(device["key"])
+        container = _read_container(bytes.fromhex(device["advertisement"]))
+        batch = [container] * args.batch
+
+        def victron_ble() -> bytes:
+            ctr = Counter.new(128, initial_value=container.iv, little_endian=True)
+            cipher = AES.new(key, AES.MODE_CTR, counter=ctr)
+            return cipher.decrypt(pad(container.encrypted_data[1:], 16))
+
+        baseline = _per_packet_ns(victron_ble, args.number)
+        reused = _per_packet_ns(lambda: _decrypt(container, key), args.number)
+        batched = _per_packet_ns(
+            lambda: _decrypt_many(batch, key),
+            max(1, args.number // args.batch),
+            args.batch,
+        )
+        print(f"{device_id:<24} {baseline:>12.0f} {reused:>8.0f} {batched:>8.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Load-test a fleet with simulated encrypted advertisements.
+
+Run from the repository root with ``python -m benchmarks.load``. By default
+the simulated packets are generated up front, so only the parser is timed,
+and fed through one VictronBluetoothFleet as fast as it takes them. With
+``--rate`` the simulator paces them live at that many packets per second
+instead, and the run exits non-zero if generation and parsing together fell
+behind.
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+from victron_ble_ha_parser import AdvertisementSimulator, VictronBluetoothFleet
+
+
+def main() -> int:
+    """Print the packets per second the fleet parses."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--packets", type=int, default=100_000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.5)
+    parser.add_argument("--malformed-ratio", type=float, default=0.01)
+    parser.add_argument("--dedupe-cache-size", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    # malformed packets would log a key mismatch for every device
+    logging.disable(logging.ERROR)
+
+    simulator = AdvertisementSimulator(
+        args.devices,
+        duplicate_ratio=args.duplicate_ratio,
+        malformed_ratio=args.malformed_ratio,
+        seed=args.seed,
+    )
+    fleet = VictronBluetoothFleet(
+        simulator.advertisement_keys(), dedupe_cache_size=args.dedupe_cache_size
+    )
+    infos = simulator.service_infos(args.packets, args.rate)
+    if args.rate is None:
+        start = time.perf_counter()
+        infos = list(infos)  # type: ignore [assignment]
+        elapsed = time.perf_counter() - start
+        print(f"generated {args.packets / elapsed:>12,.0f} packets/s")
+
+    start = time.perf_counter()
+    for info in infos:
+        fleet.update(info)
+    elapsed = time.perf_counter() - start
+    rate = args.packets / elapsed
+    print(f"parsed    {rate:>12,.0f} packets/s")
+    if args.rate is not None and rate < args.rate * 0.99:
+        print(f"Fell behind {args.rate:,.0f} packets/s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
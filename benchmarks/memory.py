@@ -0,0 +1,66 @@
+"""Compare the memory cost of update() and decode_reading() per fixture device.
+
+Run from the repository root with ``python -m benchmarks.memory``. For each
+device type, both paths decode the same advertisement; the peak bytes
+allocated while handling one packet and the bytes retained per packet when
+keeping the decoded values (a copy of the SensorUpdate values, or the
+reading itself) are reported.
+"""
+
+import argparse
+import sys
+import tracemalloc
+
+from collections.abc import Callable
+
+from victron_ble_ha_parser import VictronBluetoothDeviceData
+
+from tests.fixtures import DEVICES, make_service_info
+
+
+def _memory(case: Callable[[], object], number: int) -> tuple[int, int]:
+    """Return the peak bytes of one call and the bytes kept per stored result."""
+    tracemalloc.start()
+    try:
+        for _ in range(3):
+            case()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+        before, _ = tracemalloc.get_traced_memory()
+        kept = [case() for _ in range(number)]
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return peak - before, (after - before) // number
+
+
+def main() -> int:
+    """Print the memory cost of both decode paths for every fixture device."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=1000)
+    args = parser.parse_args()
+
+    header = ("device", "update peak", "kept", "reading peak", "kept")
+    print("{:<24} {:>12} {:>6} {:>13} {:>6}".format(*header))
+    for device_id, device in DEVICES.items():
+        info = make_service_info(device_id)
+        raw_data = bytes.fromhex(device["advertisement"])
+        parser_data = VictronBluetoothDeviceData(device["key"])
+        update_peak, update_kept = _memory(
+            lambda: dict(parser_data.update(info).entity_values), args.number
+        )
+        reading_peak, reading_kept = _memory(
+            lambda: parser_data.decode_reading(raw_data), args.number
+        )
+        print(
+            f"{device_id:<24} {update_peak:>12} {update_kept:>6}"
+            f" {reading_peak:>13} {reading_kept:>6}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Benchmark archive replay throughput with 1, 2, 4 and 8 worker processes.
+
+Run from the repository root with ``python -m benchmarks.replay``.
+"""
+
+import argparse
+import time
+
+from victron_ble_ha_parser import parse_advertisements, parse_advertisements_parallel
+
+from tests.fixtures import DEVICES
+
+
+def _archive(packets: int) -> tuple[list[tuple[str, bytes]], dict[str, str]]:
+    """Build a synthetic archive cycling through every fixture device."""
+    devices = [
+        (f"AA:BB:CC:DD:EE:{index:02X}", bytes.fromhex(device["advertisement"]))
+        for index, device in enumerate(DEVICES.values())
+    ]
+    keys = {
+        f"AA:BB:CC:DD:EE:{index:02X}": device["key"]
+        for index, device in enumerate(DEVICES.values())
+    }
+    return [devices[i % len(devices)] for i in range(packets)], keys
+
+
+def main() -> None:
+    """Print packets per second for serial and parallel replay."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--packets", type=int, default=400_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+    advertisements, keys = _archive(args.packets)
+
+    start = time.perf_counter()
+    parse_advertisements(advertisements, keys)
+    elapsed = time.perf_counter() - start
+    print(f"serial     {args.packets / elapsed:>12,.0f} packets/s")
+
+    for workers in (1, 2, 4, 8):
+        start = time.perf_counter()
+        for _ in parse_advertisements_parallel(
+            advertisements, keys, workers=workers, chunk_size=args.chunk_size
+        ):
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"workers={workers}  {args.packets / elapsed:>12,.0f} packets/s")
+
+
+if __name__ == "__main__":
+    main()
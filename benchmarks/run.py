@@ -0,0 +1,183 @@
+"""Benchmark the parser against every device type and compare to a baseline.
+
+Run from the repository root with ``python -m benchmarks.run``. The fixture
+devices are used as they are, and Smart Lithium, which has no fixture, is
+covered by a simulated advertisement with a fixed seed. Each case reports
+the median packets per second, the peak memory allocated while handling
+one packet and the memory blocks each packet leaves allocated. With a
+baseline file present, the run exits non-zero if any case is slower than
+the baseline by more than the tolerance; ``--save-baseline`` records the
+current results instead. Baselines store each rate relative to a
+fixed reference workload timed right before every repeat of the case, so
+they carry over between hosts and ride out short bursts of background load.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import timeit
+import tracemalloc
+
+from collections.abc import Callable
+from pathlib import Path
+
+from victron_ble.devices import SmartLithium
+
+from victron_ble_ha_parser import SimulatedDevice, VictronBluetoothDeviceData
+
+from tests.fixtures import DEVICES, make_service_info, make_service_info_with_data
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+# Timed repeats per case; the median of them is reported
+REPEATS = 15
+
+# Measured spread between runs on a busy host is up to about 20%
+DEFAULT_TOLERANCE = 0.35
+
+
+def _advertisements() -> dict[str, tuple[str, bytes]]:
+    """Return the advertisement key and manufacturer data of each device type."""
+    advertisements = {
+        device_id: (device["key"], bytes.fromhex(device["advertisement"]))
+        for device_id, device in DEVICES.items()
+    }
+    key = "00112233445566778899aabbccddeeff"
+    simulated = SimulatedDevice(
+        SmartLithium, "AA:BB:CC:DD:EE:FF", key, random.Random(0)
+    )
+    advertisements["smart_lithium"] = (key, simulated.advertisement())
+    return advertisements
+
+
+def _cases() -> dict[str, Callable[[], object]]:
+    """Build one callable per (device type, scenario) benchmark case."""
+    cases: dict[str, Callable[[], object]] = {}
+    for device_id, (key, raw_data) in sorted(_advertisements().items()):
+        info = (
+            make_service_info(device_id)
+            if device_id in DEVICES
+            else make_service_info_with_data(raw_data)
+        )
+        warm = VictronBluetoothDeviceData(key)
+        warm.update(info)
+        dedupe = VictronBluetoothDeviceData(key, dedupe_cache_size=16)
+        dedupe.update(info)
+
+        cases[f"{device_id}/update_cold"] = (
+            lambda key=key, info=info: VictronBluetoothDeviceData(key).update(info)
+        )
+        cases[f"{device_id}/update_warm"] = lambda d=warm, info=info: d.update(info)
+        cases[f"{device_id}/update_duplicate"] = lambda d=dedupe, info=info: d.update(
+            info
+        )
+        cases[f"{device_id}/supported"] = lambda d=warm, info=info: d.supported(info)
+        cases[f"{device_id}/validate_key"] = (
+            lambda d=warm, raw_data=raw_data: d.validate_advertisement_key(raw_data)
+        )
+    return cases
+
+
+def _reference() -> object:
+    """Run a fixed pure-Python workload used to normalize for host speed."""
+    return sorted(range(200, 0, -1))
+
+
+def _measure(case: Callable[[], object], number: int) -> tuple[float, float]:
+    """Return the median packets per second and the median score of a case.
+
+    The score is the rate relative to the reference workload, which is
+    timed right before every repeat, so a burst of background load slows
+    both and largely cancels out.
+    """
+    rates = []
+    scores = []
+    for _ in range(REPEATS):
+        reference = timeit.timeit(_reference, number=number)
+        elapsed = timeit.timeit(case, number=number)
+        rates.append(number / elapsed)
+        scores.append(reference / elapsed)
+    return statistics.median(rates), statistics.median(scores)
+
+
+# Packets handled to count the blocks allocated per packet
+ALLOCATION_PACKETS = 100
+
+
+def _peak_bytes(case: Callable[[], object]) -> int:
+    """Return the peak memory allocated while handling one packet."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        case()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def _allocated_blocks(case: Callable[[], object]) -> float:
+    """Return the memory blocks each packet leaves allocated, on average.
+
+    The results are kept until the second snapshot, so the count covers
+    the update handed to the caller as well as any state the case retains.
+    Temporaries freed within a packet do not show up in a snapshot.
+    """
+    own_traces = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot().filter_traces(own_traces)
+        results = [case() for _ in range(ALLOCATION_PACKETS)]
+        after = tracemalloc.take_snapshot().filter_traces(own_traces)
+    finally:
+        tracemalloc.stop()
+    del results
+    count = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return count / ALLOCATION_PACKETS
+
+
+def main() -> int:
+    """Run every case, print the results and check them against the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("-k", dest="pattern", default="", help="run matching cases")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())
+
+    results: dict[str, float] = {}
+    regressions = []
+    print(f"{'case':<40} {'packets/s':>12} {'peak B':>8} {'blocks':>7} {'vs base':>8}")
+    for name, case in _cases().items():
+        if args.pattern not in name:
+            continue
+        rate, score = _measure(case, args.number)
+        results[name] = score
+        peak = _peak_bytes(case)
+        blocks = _allocated_blocks(case)
+        ratio = ""
+        if name in baseline:
+            ratio = f"{score / baseline[name]:.2f}x"
+            if score < baseline[name] * (1 - args.tolerance):
+                regressions.append(name)
+        print(f"{name:<40} {rate:>12,.0f} {peak:>8} {blocks:>7.1f} {ratio:>8}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.baseline}")
+    if regressions:
+        print("Slower than baseline: " + ", ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Advertisement fixtures shared by the tests and the benchmarks."""
+
+from home_assistant_bluetooth import BluetoothServiceInfo
+
+from victron_ble_ha_parser.parser import _decrypt, _read_container
+
+# Test data from upstream keshavdv/victron-ble test suite
+
+DEVICES = {
+    "battery_monitor": {
+        "name": "SmartShunt",
+        "advertisement": "100289a302b040af925d09a4d89aa0128bdef48c6298a9",
+        "key": "aff4d0995b7d1e176c0c33ecb9e70dcd",
+    },
+    "battery_sense": {
+        "name": "Smart Battery Sense",
+        "advertisement": "1000a4a3025f150d8dcbff517f30eb65e76b22a04ac4e1",
+        "key": "0da694539597f9cf6c613cde60d7bf05",
+    },
+    "solar_charger": {
+        "name": "BlueSolar MPPT",
+        "advertisement": "100242a0016207adceb37b605d7e0ee21b24df5c",
+        "key": "adeccb947395801a4dd45a2eaa44bf17",
+    },
+    "dc_dc_converter": {
+        "name": "Orion Smart DC-DC",
+        "advertisement": "1000c0a304121d64ca8d442b90bbdf6a8cba",
+        "key": "64ba49f1a8562e45197a8e1fe50d7658",
+    },
+    "dc_energy_meter": {
+        "name": "DC Energy Meter",
+        "advertisement": "100289a30d787fafde83ccec982199fd815286",
+        "key": "aff4d0995b7d1e176c0c33ecb9e70dcd",
+    },
+    "smart_battery_protect": {
+        "name": "Smart Battery Protect",
+        "advertisement": "1080b0a3093523fadedea38b1af8bcbde91ca8b6dbb60e",
+        "key": "fac570d66380b797a5b7543758be00e4",
+    },
+    "vebus": {
+        "name": "MultiPlus-II",
+        "advertisement": "100380270c1252dad26f0b8eb39162074d140df410",
+        "key": "da3f5fa2860cb1cf86ba7a6d1d16b9dd",
+    },
+    "ac_charger": {
+        "name": "Smart Charger",
+        "advertisement": "100030a308f926c1b5170a0d2280335bf12d5ed083",
+        "key": "c129cf8f75c3fe5a1655b481e205fb7d",
+    },
+    # Inverter and Orion XS advertisements generated from known decrypted
+    # payloads (no upstream victron-ble test fixtures exist for these yet).
+    "inverter": {
+        "name": "Phoenix Inverter",
+        "advertisement": "100064a2033412aa4d1c7c1e0100570c5f4d938199990f1d",
+        "key": "aabbccdd11223344aabbccdd11223344",
+    },
+    "orion_xs": {
+        "name": "Orion XS",
+        "advertisement": "1000f0a30f3412ff4633ad59199dc8614355ac6cb10d009c",
+        "key": "ffeeddcc99887766ffeeddcc99887766",
+    },
+}
+
+
+def make_service_info(
+    device_id: str, address: str = "AA:BB:CC:DD:EE:FF"
+) -> BluetoothServiceInfo:
+    device = DEVICES[device_id]
+    return BluetoothServiceInfo(
+        name=device["name"],
+        address=address,
+        rssi=-60,
+        manufacturer_data={0x02E1: bytes.fromhex(device["advertisement"])},
+        service_data={},
+        service_uuids=[],
+        source="local",
+    )
+
+
+def make_service_info_with_data(manufacturer_data: bytes) -> BluetoothServiceInfo:
+    """Create a BluetoothServiceInfo with arbitrary Victron manufacturer data."""
+    return BluetoothServiceInfo(
+        name="Test Device",
+        address="AA:BB:CC:DD:EE:FF",
+        rssi=-60,
+        manufacturer_data={0x02E1: manufacturer_data},
+        service_data={},
+        service_uuids=[],
+        source="local",
+    )
+
+
+def make_inverter_advertisement(alarm: int) -> bytes:
+    """Re-encrypt the inverter fixture with another raw alarm code.
+
+    Codes combining several alarm reasons, such as 3, decrypt and parse but
+    make victron-ble's InverterData.get_alarm() raise ValueError.
+    """
+    raw_data = bytes.fromhex(DEVICES["inverter"]["advertisement"])
+    key = bytes.fromhex(DEVICES["inverter"]["key"])
+    container = _read_container(raw_data)
+    size = len(container.encrypted_data) - 1
+    plaintext = bytearray(_decrypt(container, key)[:size])
+    plaintext[1:3] = alarm.to_bytes(2, "little")
+    # AES-CTR encrypts by applying the same keystream that decrypts
+    encrypted = _decrypt(_read_container(raw_data[:8] + plaintext), key)
+    return raw_data[:8] + encrypted[:size]
@@ -0,0 +1,175 @@
+"""Tests for bulk decoding of advertisements."""
+
+import math
+
+from victron_ble_ha_parser import (
+    Keys,
+    VictronBluetoothDeviceData,
+    parse_advertisements,
+    parse_advertisements_columnar,
+    parse_advertisements_parallel,
+)
+
+from .fixtures import DEVICES, make_inverter_advertisement, make_service_info
+
+
+def _address(device_id: str) -> str:
+    return f"AA:BB:CC:DD:EE:{list(DEVICES).index(device_id):02X}"
+
+
+class TestParseAdvertisements:
+    """parse_advertisements() matches the per-packet parser."""
+
+    def test_matches_update(self) -> None:
+        """Every fixture decodes to the same values update() reports."""
+        advertisements = [
+            (_address(device_id), bytes.fromhex(device["advertisement"]))
+            for device_id, device in DEVICES.items()
+        ]
+        keys = {
+            _address(device_id): device["key"] for device_id, device in DEVICES.items()
+        }
+        readings = parse_advertisements(advertisements, keys)
+
+        for device_id, reading in zip(DEVICES, readings):
+            device = VictronBluetoothDeviceData(DEVICES[device_id]["key"])
+            update = device.update(make_service_info(device_id))
+            expected = {
+                Keys(device_key.key): value.native_value
+                for device_key, value in update.entity_values.items()
+                if device_key.key != "signal_strength"
+            }
+            assert reading == expected
+
+    def test_rejected_advertisements_yield_none(self) -> None:
+        """Unknown addresses, bad keys and malformed payloads keep their slot."""
+        shunt = bytes.fromhex(DEVICES["battery_monitor"]["advertisement"])
+        bad_key = "00" + DEVICES["battery_monitor"]["key"][2:]
+        readings = parse_advertisements(
+            [
+                ("unknown", shunt),
+                ("bad", shunt),
+                ("good", b"\x10"),
+                ("good", shunt),
+            ],
+            {"bad": bad_key, "good": DEVICES["battery_monitor"]["key"]},
+        )
+        assert readings[:3] == [None, None, None]
+        assert readings[3] is not None
+        assert readings[3][Keys.VOLTAGE] == 12.53
+
+    def test_unknown_enum_code_yields_none(self) -> None:
+        """A payload whose enum getter raises yields None, not an exception."""
+        key = DEVICES["inverter"]["key"]
+        readings = parse_advertisements(
+            [
+                ("inverter", make_inverter_advertisement(3)),
+                ("inverter", make_inverter_advertisement(1)),
+            ],
+            {"inverter": key},
+        )
+        assert readings[0] is None
+        assert readings[1] is not None
+        assert readings[1][Keys.ALARM] == "low_voltage"
+
+    def test_memoryview_slices(self) -> None:
+        """Records sliced out of one shared buffer decode like bytes."""
+        payloads = [
+            bytes.fromhex(device["advertisement"]) for device in DEVICES.values()
+        ]
+        buffer = memoryview(b"".join(payloads))
+        views = []
+        offset = 0
+        for payload in payloads:
+            views.append(buffer[offset : offset + len(payload)])
+            offset += len(payload)
+        keys = {
+            _address(device_id): device["key"] for device_id, device in DEVICES.items()
+        }
+        assert parse_advertisements(
+            zip(map(_address, DEVICES), views), keys
+        ) == parse_advertisements(zip(map(_address, DEVICES), payloads), keys)
+
+
+class TestParseAdvertisementsColumnar:
+    """parse_advertisements_columnar() lays readings out per device type."""
+
+    def test_columns(self) -> None:
+        """Numeric values become floats and enums become category codes."""
+        solar = bytes.fromhex(DEVICES["solar_charger"]["advertisement"])
+        shunt = bytes.fromhex(DEVICES["battery_monitor"]["advertisement"])
+        tables = parse_advertisements_columnar(
+            [
+                (2.0, "mppt", solar),
+                (1.0, "shunt", shunt),
+                (3.0, "mppt", solar),
+                (4.0, "mppt", b"\x10"),
+            ],
+            {
+                "mppt": DEVICES["solar_charger"]["key"],
+                "shunt": DEVICES["battery_monitor"]["key"],
+            },
+        )
+        assert set(tables) == {"SolarCharger", "BatteryMonitor"}
+
+        solar_table = tables["SolarCharger"]
+        assert list(solar_table.columns["timestamp"]) == [2.0, 3.0]
+        assert solar_table.columns["address"] == ["mppt", "mppt"]
+        assert list(solar_table.columns[Keys.BATTERY_VOLTAGE]) == [13.88, 13.88]
+        codes = solar_table.columns[Keys.CHARGE_STATE]
+        assert codes.typecode == "h"
+        categories = solar_table.categories[Keys.CHARGE_STATE]
+        assert [categories[code] for code in codes] == ["absorption", "absorption"]
+
+        shunt_table = tables["BatteryMonitor"]
+        assert math.isnan(shunt_table.columns[Keys.REMAINING_MINUTES][0])
+
+    def test_undecodable_rows_dropped(self) -> None:
+        """A row whose enum getter raises is left out of an otherwise full table."""
+        tables = parse_advertisements_columnar(
+            [
+                (1.0, "inverter", make_inverter_advertisement(1)),
+                (2.0, "inverter", make_inverter_advertisement(3)),
+                (3.0, "inverter", make_inverter_advertisement(2)),
+            ],
+            {"inverter": DEVICES["inverter"]["key"]},
+        )
+        table = tables["Inverter"]
+        assert list(table.columns["timestamp"]) == [1.0, 3.0]
+        categories = table.categories[Keys.ALARM]
+        assert [categories[code] for code in table.columns[Keys.ALARM]] == [
+            "low_voltage",
+            "high_voltage",
+        ]
+
+
+class TestParseAdvertisementsParallel:
+    """parse_advertisements_parallel() matches the single-process decoder."""
+
+    def test_matches_serial_in_order(self) -> None:
+        """Chunks decoded in worker processes are merged back in input order."""
+        advertisements = [
+            (_address(device_id), bytes.fromhex(device["advertisement"]))
+            for device_id, device in DEVICES.items()
+        ] * 3
+        keys = {
+            _address(device_id): device["key"] for device_id, device in DEVICES.items()
+        }
+        readings = list(
+            parse_advertisements_parallel(advertisements, keys, workers=2, chunk_size=4)
+        )
+        assert readings == parse_advertisements(advertisements, keys)
+
+    def test_undecodable_payload_yields_none(self) -> None:
+        """A payload whose enum getter raises does not abort the replay."""
+        key = DEVICES["inverter"]["key"]
+        advertisements = [
+            ("inverter", make_inverter_advertisement(alarm)) for alarm in (1, 3, 2)
+        ] * 3
+        readings = list(
+            parse_advertisements_parallel(
+                advertisements, {"inverter": key}, workers=2, chunk_size=2
+            )
+        )
+        assert [reading is None for reading in readings] == [False, True, False] * 3
+        assert readings == parse_advertisements(advertisements, {"inverter": key})
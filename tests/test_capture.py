@@ -0,0 +1,105 @@
+"""Tests for capture files."""
+
+from pathlib import Path
+
+import pytest
+
+from victron_ble_ha_parser import (
+    CaptureReader,
+    CaptureWriter,
+    VictronBluetoothDeviceData,
+    parse_advertisements,
+)
+
+from .fixtures import DEVICES
+
+
+def _address(device_id: str) -> str:
+    return f"AA:BB:CC:DD:EE:{list(DEVICES).index(device_id):02X}"
+
+
+def _write_fixtures(path: Path, repeat: int = 1, index_interval: int = 4) -> None:
+    with CaptureWriter(path, index_interval=index_interval) as writer:
+        timestamp = 0.0
+        for _ in range(repeat):
+            for device_id, device in DEVICES.items():
+                writer.write(
+                    timestamp,
+                    _address(device_id),
+                    -70,
+                    bytes.fromhex(device["advertisement"]),
+                )
+                timestamp += 1.0
+
+
+class TestCaptureFile:
+    """Records round-trip through a capture file and decode from the mapping."""
+
+    def test_round_trip(self, tmp_path: Path) -> None:
+        """Every written record is read back unchanged."""
+        path = tmp_path / "capture.vble"
+        _write_fixtures(path)
+        with CaptureReader(path) as reader:
+            records = list(reader)
+            assert [record.address for record in records] == list(
+                map(_address, DEVICES)
+            )
+            assert [bytes(record.data) for record in records] == [
+                bytes.fromhex(device["advertisement"]) for device in DEVICES.values()
+            ]
+            assert {record.rssi for record in records} == {-70}
+
+    def test_decode_from_mapping(self, tmp_path: Path) -> None:
+        """Records feed the device parser and the batch decoder directly."""
+        path = tmp_path / "capture.vble"
+        _write_fixtures(path)
+        keys = {_address(device_id): d["key"] for device_id, d in DEVICES.items()}
+        with CaptureReader(path) as reader:
+            readings = parse_advertisements(
+                ((record.address, record.data) for record in reader), keys
+            )
+            assert all(reading is not None for reading in readings)
+            for device_id, record in zip(DEVICES, reader):
+                device = VictronBluetoothDeviceData(DEVICES[device_id]["key"])
+                assert device.decode_reading(record.data) is not None
+                assert device.update(record.to_service_info()).devices
+
+    @pytest.mark.parametrize(("start", "end"), [(0, 3), (5.5, 17), (18, None)])
+    def test_time_range(self, tmp_path: Path, start: float, end: float) -> None:
+        """records() returns exactly the records in [start, end)."""
+        path = tmp_path / "capture.vble"
+        _write_fixtures(path, repeat=2)
+        with CaptureReader(path) as reader:
+            expected = [
+                record.timestamp
+                for record in reader
+                if record.timestamp >= start and (end is None or record.timestamp < end)
+            ]
+            assert [r.timestamp for r in reader.records(start, end)] == expected
+
+    def test_unfinished_file(self, tmp_path: Path) -> None:
+        """A file without index, cut short mid-record, reads up to the cut."""
+        path = tmp_path / "capture.vble"
+        _write_fixtures(path)
+        complete = path.read_bytes()
+        # drop the index, the trailer and half of the last record
+        with CaptureReader(path) as reader:
+            last = list(reader)[-1]
+            cut = reader._end - len(last.data) // 2
+        path.write_bytes(complete[:cut])
+        with CaptureReader(path) as reader:
+            timestamps = [record.timestamp for record in reader.records(start=2)]
+        assert timestamps == [float(t) for t in range(2, len(DEVICES) - 1)]
+
+    def test_invalid(self, tmp_path: Path) -> None:
+        """Out-of-order records and foreign files are rejected."""
+        path = tmp_path / "capture.vble"
+        with CaptureWriter(path) as writer:
+            writer.write(1.0, "AA:BB:CC:DD:EE:FF", -70, b"\x10")
+            with pytest.raises(ValueError):
+                writer.write(0.0, "AA:BB:CC:DD:EE:FF", -70, b"\x10")
+            with pytest.raises(ValueError):
+                writer.write(2.0, "AA:BB", -70, b"\x10")
+        path.write_bytes(b"not a capture file")
+        with pytest.raises(ValueError):
+            CaptureReader(path)
@@ -2,79 +2,20 @@
 
 import pytest
 from home_assistant_bluetooth import BluetoothServiceInfo
+from sensor_state_data import DeviceKey
 from syrupy.assertion import SnapshotAssertion
+from victron_ble.devices import BatteryMonitor
+from victron_ble.devices.base import AlarmReason
 
-from victron_ble_ha_parser import VictronBluetoothDeviceData
-
-# Test data from upstream keshavdv/victron-ble test suite
-
-DEVICES = {
-    "battery_monitor": {
-        "name": "SmartShunt",
-        "advertisement": "100289a302b040af925d09a4d89aa0128bdef48c6298a9",
-        "key": "aff4d0995b7d1e176c0c33ecb9e70dcd",
-    },
-    "battery_sense": {
-        "name": "Smart Battery Sense",
-        "advertisement": "1000a4a3025f150d8dcbff517f30eb65e76b22a04ac4e1",
-        "key": "0da694539597f9cf6c613cde60d7bf05",
-    },
-    "solar_charger": {
-        "name": "BlueSolar MPPT",
-        "advertisement": "100242a0016207adceb37b605d7e0ee21b24df5c",
-        "key": "adeccb947395801a4dd45a2eaa44bf17",
-    },
-    "dc_dc_converter": {
-        "name": "Orion Smart DC-DC",
-        "advertisement": "1000c0a304121d64ca8d442b90bbdf6a8cba",
-        "key": "64ba49f1a8562e45197a8e1fe50d7658",
-    },
-    "dc_energy_meter": {
-        "name": "DC Energy Meter",
-        "advertisement": "100289a30d787fafde83ccec982199fd815286",
-        "key": "aff4d0995b7d1e176c0c33ecb9e70dcd",
-    },
-    "smart_battery_protect": {
-        "name": "Smart Battery Protect",
-        "advertisement": "1080b0a3093523fadedea38b1af8bcbde91ca8b6dbb60e",
-        "key": "fac570d66380b797a5b7543758be00e4",
-    },
-    "vebus": {
-        "name": "MultiPlus-II",
-        "advertisement": "100380270c1252dad26f0b8eb39162074d140df410",
-        "key": "da3f5fa2860cb1cf86ba7a6d1d16b9dd",
-    },
-    "ac_charger": {
-        "name": "Smart Charger",
-        "advertisement": "100030a308f926c1b5170a0d2280335bf12d5ed083",
-        "key": "c129cf8f75c3fe5a1655b481e205fb7d",
-    },
-    # Inverter and Orion XS advertisements generated from known decrypted
-    # payloads (no upstream victron-ble test fixtures exist for these yet).
-    "inverter": {
-        "name": "Phoenix Inverter",
-        "advertisement": "100064a2033412aa4d1c7c1e0100570c5f4d938199990f1d",
-        "key": "aabbccdd11223344aabbccdd11223344",
-    },
-    "orion_xs": {
-        "name": "Orion XS",
-        "advertisement": "1000f0a30f3412ff4633ad59199dc8614355ac6cb10d009c",
-        "key": "ffeeddcc99887766ffeeddcc99887766",
-    },
-}
-
-
-def make_service_info(device_id: str) -> BluetoothServiceInfo:
-    device = DEVICES[device_id]
-    return BluetoothServiceInfo(
-        name=device["name"],
-        address="AA:BB:CC:DD:EE:FF",
-        rssi=-60,
-        manufacturer_data={0x02E1: bytes.fromhex(device["advertisement"])},
-        service_data={},
-        service_uuids=[],
-        source="local",
-    )
+from victron_ble_ha_parser import VictronBluetoothDeviceData, VictronReading
+from victron_ble_ha_parser.parser import _enum_to_lowercase, _shared_device
+
+from .fixtures import (
+    DEVICES,
+    make_inverter_advertisement,
+    make_service_info,
+    make_service_info_with_data,
+)
 
 
 @pytest.mark.parametrize("device_id", DEVICES.keys())
@@ -94,19 +35,6 @@ class TestDeviceSensors:
         assert update == snapshot
 
 
-def make_service_info_with_data(manufacturer_data: bytes) -> BluetoothServiceInfo:
-    """Create a BluetoothServiceInfo with arbitrary Victron manufacturer data."""
-    return BluetoothServiceInfo(
-        name="Test Device",
-        address="AA:BB:CC:DD:EE:FF",
-        rssi=-60,
-        manufacturer_data={0x02E1: manufacturer_data},
-        service_data={},
-        service_uuids=[],
-        source="local",
-    )
-
-
 # A known-good advertisement payload used to exercise key validation in isolation.
 _BATTERY_MONITOR_ADV = bytes.fromhex(DEVICES["battery_monitor"]["advertisement"])
 
@@ -165,23 +93,271 @@ class TestStaleDataCleared:
         assert len(update1.entity_values) > 1
 
         # Switch to a bad key and try again with the same advertisement
-        device._advertisement_key = "00" + good_key[2:]
+        device._set_advertisement_key("00" + good_key[2:])
         update2 = device.update(make_service_info("battery_monitor"))
         assert len(update2.entity_values) <= 1
 
 
-@pytest.mark.parametrize(
-    "key",
-    [
-        "",
-        "not-hex",
-        "00",
-    ],
-)
 class TestInvalidAdvertisementKey:
-    """Invalid advertisement keys must never raise and validate_advertisement_key must return False."""
+    """Invalid advertisement keys are rejected when the parser is created."""
 
-    def test_validate_key_returns_false(self, key: str) -> None:
-        """validate_advertisement_key() returns False for invalid key strings."""
-        device = VictronBluetoothDeviceData(key)
+    def test_empty_key_validates_false(self) -> None:
+        """validate_advertisement_key() returns False when no key is set."""
+        device = VictronBluetoothDeviceData("")
         assert device.validate_advertisement_key(_BATTERY_MONITOR_ADV) is False
+
+    @pytest.mark.parametrize(
+        "key",
+        [
+            "not-hex",
+            "00",
+            DEVICES["battery_monitor"]["key"] + "00",
+        ],
+    )
+    def test_malformed_key_raises(self, key: str) -> None:
+        """Malformed key strings raise ValueError up front."""
+        with pytest.raises(ValueError, match="Invalid advertisement key"):
+            VictronBluetoothDeviceData(key)
+
+    def test_parser_shared_across_devices(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """The device parser is built once per device class, not per device."""
+        built = []
+        original = BatteryMonitor.__init__
+
+        def init(self: BatteryMonitor, advertisement_key: str) -> None:
+            built.append(self)
+            original(self, advertisement_key)
+
+        monkeypatch.setattr(BatteryMonitor, "__init__", init)
+        _shared_device.cache_clear()
+        for _ in range(2):
+            device = VictronBluetoothDeviceData(DEVICES["battery_monitor"]["key"])
+            device.update(make_service_info("battery_monitor"))
+            device.update(make_service_info("battery_monitor"))
+        _shared_device.cache_clear()
+        assert len(built) == 1
+
+
+class TestSinglePassUpdate:
+    """An advertisement is detected, split and decrypted only once per update."""
+
+    def test_detect_and_parse_container_once(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """update() runs device detection and container parsing exactly once."""
+        from victron_ble_ha_parser import parser as parser_module
+
+        calls = {"detect": 0, "container": 0}
+        detect = parser_module.detect_device_type
+        read_container = parser_module._read_container
+
+        def counting_detect(data: bytes):  # type: ignore[no-untyped-def]
+            calls["detect"] += 1
+            return detect(data)
+
+        def counting_read_container(data: bytes):  # type: ignore[no-untyped-def]
+            calls["container"] += 1
+            return read_container(data)
+
+        monkeypatch.setattr(parser_module, "_read_container", counting_read_container)
+        monkeypatch.setattr(parser_module, "detect_device_type", counting_detect)
+        device = VictronBluetoothDeviceData(DEVICES["battery_monitor"]["key"])
+        update = device.update(make_service_info("battery_monitor"))
+        assert len(update.entity_values) > 1
+        assert calls == {"detect": 1, "container": 1}
+
+
+class TestSensorRegistry:
+    """The precomputed sensor table is consistent for every device class."""
+
+    def test_no_duplicate_keys(self) -> None:
+        """No data class emits the same sensor key twice."""
+        from victron_ble_ha_parser.parser import _SENSORS
+
+        for data_type, sensors in _SENSORS.items():
+            keys = [field.device_key for field in sensors]
+            assert len(keys) == len(set(keys)), data_type.__name__
+
+    def test_descriptions_shared_between_updates(self) -> None:
+        """Sensor descriptions are built once, not once per advertisement."""
+        device = VictronBluetoothDeviceData(DEVICES["solar_charger"]["key"])
+        update1 = device.update(make_service_info("solar_charger"))
+        descriptions = dict(update1.entity_descriptions)
+        update2 = device.update(make_service_info("solar_charger"))
+        for device_key, description in update2.entity_descriptions.items():
+            if device_key.key != "signal_strength":
+                assert description is descriptions[device_key]
+
+    def test_enum_names(self) -> None:
+        """Enum values are looked up in frozen tables; UNKNOWN reports None."""
+        from victron_ble.devices.base import ACInState, OperationMode
+
+        from victron_ble_ha_parser.parser import _enum_names
+
+        names = _enum_names(ACInState)
+        assert names[ACInState.AC_IN_1] == "ac_in_1"
+        assert names[ACInState.UNKNOWN] is None
+        assert names[None] is None
+        assert _enum_to_lowercase(ACInState.UNKNOWN) is None
+        assert _enum_to_lowercase(OperationMode.FLOAT) is _enum_to_lowercase(
+            OperationMode.FLOAT
+        )
+        with pytest.raises(TypeError):
+            names[ACInState.AC_IN_1] = "changed"  # type: ignore[index]
+
+
+@pytest.mark.parametrize("device_id", DEVICES.keys())
+class TestDecodeReading:
+    """decode_reading() returns the same values as update() in a compact record."""
+
+    def test_matches_update(self, device_id: str) -> None:
+        """Every sensor of the reading matches the value update() reports."""
+        device = VictronBluetoothDeviceData(DEVICES[device_id]["key"])
+        reading = device.decode_reading(
+            bytes.fromhex(DEVICES[device_id]["advertisement"])
+        )
+        assert isinstance(reading, VictronReading)
+        values = {
+            device_key.key: value.native_value
+            for device_key, value in device.update(
+                make_service_info(device_id)
+            ).entity_values.items()
+            if device_key.key != "signal_strength"
+        }
+        assert set(values) == set(reading._fields)
+        for key, value in zip(reading._fields, reading):
+            if key in reading._enum_types:
+                assert isinstance(value, (int, type(None)))
+                value = _enum_to_lowercase(reading.enum(key))
+            assert values[key] == value
+
+    def test_wrong_key(self, device_id: str) -> None:
+        """Advertisements that do not match the key decode to None."""
+        device = VictronBluetoothDeviceData("00" * 16)
+        assert (
+            device.decode_reading(bytes.fromhex(DEVICES[device_id]["advertisement"]))
+            is None
+        )
+
+
+class TestUnknownEnumCode:
+    """Payloads with enum codes victron-ble does not know fail to decode."""
+
+    def test_decode_reading(self) -> None:
+        """decode_reading() returns None instead of raising."""
+        device = VictronBluetoothDeviceData(DEVICES["inverter"]["key"])
+        assert device.decode_reading(make_inverter_advertisement(3)) is None
+        reading = device.decode_reading(make_inverter_advertisement(1))
+        assert reading is not None
+        assert reading.enum("alarm") is AlarmReason.LOW_VOLTAGE
+
+    def test_update(self) -> None:
+        """update() reports no sensor values instead of raising."""
+        device = VictronBluetoothDeviceData(
+            DEVICES["inverter"]["key"], enable_metrics=True
+        )
+        update = device.update(
+            make_service_info_with_data(make_inverter_advertisement(3))
+        )
+        assert set(update.entity_values) == {DeviceKey("signal_strength", None)}
+        assert device.metrics()["parse_failures"] == 1
+
+
+@pytest.mark.parametrize("device_id", DEVICES.keys())
+class TestBufferInput:
+    """Advertisements can be decoded from views into a larger buffer."""
+
+    def test_memoryview_slice(self, device_id: str) -> None:
+        """A memoryview slice decodes like the equivalent bytes."""
+        raw_data = bytes.fromhex(DEVICES[device_id]["advertisement"])
+        buffer = bytearray(b"\xff" * 5 + raw_data + b"\xff" * 5)
+        view = memoryview(buffer)[5 : 5 + len(raw_data)]
+        device = VictronBluetoothDeviceData(DEVICES[device_id]["key"])
+        assert device.validate_advertisement_key(view)
+        assert device.decode_reading(view) == device.decode_reading(raw_data)
+
+
+class TestPrefilter:
+    """The static prefilter agrees with device detection."""
+
+    def test_matches_detection(self) -> None:
+        """Candidates are exactly the advertisements detected as supported."""
+        from victron_ble.devices import detect_device_type
+
+        from victron_ble_ha_parser.parser import _DEVICE_SENSORS, _is_candidate
+
+        for model_id in (0x0000, 0xA389, 0xA3A4, 0xA3A5, 0xFFFF):
+            for readout_type in range(256):
+                data = bytes(
+                    (0x10, 0, model_id & 0xFF, model_id >> 8, readout_type)
+                ) + bytes(4)
+                assert _is_candidate(data) == (
+                    detect_device_type(data) in _DEVICE_SENSORS
+                ), (hex(model_id), readout_type)
+
+    def test_rejects_without_detection(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Rejected advertisements never reach detection, in update or supported."""
+        from victron_ble_ha_parser import parser as parser_module
+
+        def fail(data: bytes) -> None:
+            raise AssertionError("detect_device_type called")
+
+        monkeypatch.setattr(parser_module, "detect_device_type", fail)
+        device = VictronBluetoothDeviceData(DEVICES["battery_monitor"]["key"])
+        for raw_data in (b"\x11" + bytes(9), b"\x10\x00\xff\xff\x06" + bytes(5)):
+            info = make_service_info_with_data(raw_data)
+            assert not device.supported(info)
+            assert not device.update(info).entity_descriptions.keys() - {
+                DeviceKey("signal_strength", None)
+            }
+
+
+class TestDecrypt:
+    """The reused-cipher decryption matches victron-ble byte for byte."""
+
+    @pytest.mark.parametrize("device_id", DEVICES.keys())
+    def test_matches_victron_ble(self, device_id: str) -> None:
+        """Single and batched decryption return victron-ble's plaintext."""
+        from victron_ble.devices import detect_device_type
+
+        from victron_ble_ha_parser.parser import (
+            _decrypt,
+            _decrypt_many,
+            _read_container,
+        )
+
+        raw_data = bytes.fromhex(DEVICES[device_id]["advertisement"])
+        key = DEVICES[device_id]["key"]
+        parser = detect_device_type(raw_data)
+        assert parser is not None
+        expected = parser(key).decrypt(raw_data)
+        container = _read_container(raw_data)
+        assert _decrypt(container, bytes.fromhex(key)) == expected
+        assert _decrypt_many([container] * 3, bytes.fromhex(key)) == [expected] * 3
+
+    def test_counter_carries_across_blocks(self) -> None:
+        """Payloads longer than one block use consecutive counter blocks."""
+        from Crypto.Cipher import AES
+        from Crypto.Util import Counter
+        from Crypto.Util.Padding import pad
+        from victron_ble.devices.base import AdvertisementContainer
+
+        from victron_ble_ha_parser.parser import _decrypt, _decrypt_many
+
+        key = bytes(range(16))
+        containers = [
+            AdvertisementContainer(0x10, 0, 1, iv, b"\x00" + bytes(range(length)))
+            for iv, length in ((0xFFFF, 20), (0x0102, 31), (0, 5))
+        ]
+        expected = [
+            AES.new(
+                key,
+                AES.MODE_CTR,
+                counter=Counter.new(128, initial_value=c.iv, little_endian=True),
+            ).decrypt(pad(c.encrypted_data[1:], 16))
+            for c in containers
+        ]
+        assert [_decrypt(c, key) for c in containers] == expected
+        assert _decrypt_many(containers, key) == expected
@@ -0,0 +1,212 @@
+"""Tests for routing advertisements from many devices."""
+
+import gc
+import random
+import tracemalloc
+
+import pytest
+from home_assistant_bluetooth import BluetoothServiceInfo
+from victron_ble.devices import Inverter, SolarCharger, VEBus
+
+from victron_ble_ha_parser import (
+    AdvertisementSimulator,
+    SimulatedDevice,
+    VictronBluetoothDeviceData,
+    VictronBluetoothFleet,
+)
+from victron_ble_ha_parser.parser import _DEVICE_SENSORS, VICTRON_IDENTIFIER
+
+from .fixtures import DEVICES, make_service_info
+
+# Measured at about 4.8 KB per device, down from 7.2 KB when each device had
+# its own victron-ble parser and an instance dict too large to share keys
+MEMORY_PER_DEVICE_BUDGET = 6000
+
+
+class TestVictronBluetoothFleet:
+    """VictronBluetoothFleet routes each advertisement to its device's parser."""
+
+    def test_routes_by_address(self) -> None:
+        """Each address is parsed with its own key."""
+        fleet = VictronBluetoothFleet(
+            {
+                "aa:00:00:00:00:01": DEVICES["solar_charger"]["key"],
+                "AA:00:00:00:00:02": DEVICES["vebus"]["key"],
+            }
+        )
+        assert len(fleet) == 2
+        assert "aa:00:00:00:00:01" in fleet
+
+        for device_id, address in (
+            ("solar_charger", "AA:00:00:00:00:01"),
+            ("vebus", "AA:00:00:00:00:02"),
+        ):
+            update = fleet.update(make_service_info(device_id, address))
+            expected = VictronBluetoothDeviceData(DEVICES[device_id]["key"]).update(
+                make_service_info(device_id)
+            )
+            assert update is not None
+            assert update.entity_values == expected.entity_values
+
+    def test_unknown_address(self) -> None:
+        """Advertisements from unconfigured addresses are ignored."""
+        fleet = VictronBluetoothFleet()
+        assert fleet.update(make_service_info("solar_charger")) is None
+        assert fleet.get_device("AA:BB:CC:DD:EE:FF") is None
+
+    def test_devices_created_on_first_advertisement(self) -> None:
+        """Parsers are only created for devices that have been heard."""
+        address = "AA:BB:CC:DD:EE:FF"
+        fleet = VictronBluetoothFleet({address: DEVICES["solar_charger"]["key"]})
+        assert fleet.get_device(address) is None
+        fleet.update(make_service_info("solar_charger"))
+        assert fleet.get_device(address) is not None
+
+        fleet.remove_device(address)
+        assert address not in fleet
+        assert fleet.get_device(address) is None
+
+    def test_lowercase_advertisement_address(self) -> None:
+        """Advertisements are matched to configured addresses in any case."""
+        fleet = VictronBluetoothFleet({"AA:BB:CC:DD:EE:FF": DEVICES["vebus"]["key"]})
+        update = fleet.update(make_service_info("vebus", "aa:bb:cc:dd:ee:ff"))
+        assert update is not None
+        assert fleet.get_device("AA:BB:CC:DD:EE:FF") is not None
+        assert len(fleet) == 1
+
+    def test_memory_per_device(self) -> None:
+        """Each device that has been heard costs a few kilobytes at most."""
+        simulator = AdvertisementSimulator(200, seed=0)
+        fleet = VictronBluetoothFleet(simulator.advertisement_keys())
+        infos = list(simulator.service_infos(400))
+        # Build the shared victron-ble parsers before measuring
+        VictronBluetoothFleet(simulator.advertisement_keys()).update(infos[0])
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            for info in infos:
+                fleet.update(info)
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+        assert used / len(fleet) < MEMORY_PER_DEVICE_BUDGET
+
+    def test_malformed_key_rejected(self) -> None:
+        """Malformed keys raise when they are configured."""
+        with pytest.raises(ValueError):
+            VictronBluetoothFleet({"AA:BB:CC:DD:EE:FF": "not-hex"})
+
+
+def _service_info(device: SimulatedDevice) -> BluetoothServiceInfo:
+    """Return the next advertisement of a simulated device as a service info."""
+    return BluetoothServiceInfo(
+        name=device.parser.__name__,
+        address=device.address,
+        rssi=-60,
+        manufacturer_data={VICTRON_IDENTIFIER: device.advertisement()},
+        service_data={},
+        service_uuids=[],
+        source="local",
+    )
+
+
+class TestCandidateKeys:
+    """Unconfigured addresses are bound to the candidate key that decodes them."""
+
+    def test_binds_addresses(self) -> None:
+        """Every device type is bound after consistent advertisements."""
+        rng = random.Random(0)
+        devices = [
+            SimulatedDevice(
+                parser, f"AA:00:00:00:00:{index:02X}", f"{rng.getrandbits(128):032x}"
+            )
+            for index, parser in enumerate(_DEVICE_SENSORS)
+        ]
+        fleet = VictronBluetoothFleet(
+            candidate_keys=[device.advertisement_key for device in devices]
+        )
+        for device in devices:
+            assert fleet.update(_service_info(device)) is None
+            assert device.address not in fleet
+            info = _service_info(device)
+            update = fleet.update(info)
+            expected = VictronBluetoothDeviceData(device.advertisement_key).update(info)
+            assert update is not None
+            assert update.entity_values == expected.entity_values
+            assert device.address in fleet
+
+    def test_repeats_do_not_confirm(self) -> None:
+        """A repeated advertisement does not count as a second decode."""
+        key = "aa11" + "00" * 14
+        device = SimulatedDevice(SolarCharger, "AA:BB:CC:DD:EE:FF", key)
+        fleet = VictronBluetoothFleet(candidate_keys=[key])
+        info = _service_info(device)
+        for _ in range(3):
+            assert fleet.update(info) is None
+        assert device.address not in fleet
+
+    def test_foreign_device_sharing_check_byte(self) -> None:
+        """A wrong key with the same first byte is never bound."""
+        device = SimulatedDevice(
+            SolarCharger, "AA:BB:CC:DD:EE:FF", "aa11" + "00" * 14, random.Random(1)
+        )
+        fleet = VictronBluetoothFleet(candidate_keys=["aa22" + "00" * 14])
+        for _ in range(50):
+            assert fleet.update(_service_info(device)) is None
+        assert device.address not in fleet
+
+    def test_picks_right_key_among_check_byte_peers(self) -> None:
+        """With several keys sharing the first byte, the decoding one is bound."""
+        key = "aa11" + "00" * 14
+        device = SimulatedDevice(Inverter, "AA:BB:CC:DD:EE:FF", key, random.Random(2))
+        wrong_keys = [f"aa{index:030x}" for index in range(2, 20)]
+        fleet = VictronBluetoothFleet(candidate_keys=[*wrong_keys, key])
+        fleet.update(_service_info(device))
+        info = _service_info(device)
+        update = fleet.update(info)
+        assert update is not None
+        assert update == VictronBluetoothDeviceData(key).update(info)
+
+    def test_rebinds_after_key_change(self) -> None:
+        """A bound address that stops decoding is unbound and matched again."""
+        old_key = "aa11" + "00" * 14
+        new_key = "bb22" + "00" * 14
+        fleet = VictronBluetoothFleet(candidate_keys=[old_key, new_key])
+        device = SimulatedDevice(VEBus, "AA:BB:CC:DD:EE:FF", old_key)
+        fleet.update(_service_info(device))
+        assert fleet.update(_service_info(device)) is not None
+
+        device = SimulatedDevice(VEBus, "AA:BB:CC:DD:EE:FF", new_key)
+        assert fleet.update(_service_info(device)) is None
+        assert device.address not in fleet
+        info = _service_info(device)
+        assert fleet.update(info) == VictronBluetoothDeviceData(new_key).update(info)
+
+    def test_binds_lowercase_address(self) -> None:
+        """A lowercase address is bound and looked up upper-case."""
+        key = "aa11" + "00" * 14
+        fleet = VictronBluetoothFleet(candidate_keys=[key])
+        device = SimulatedDevice(VEBus, "aa:bb:cc:dd:ee:ff", key)
+        fleet.update(_service_info(device))
+        assert fleet.update(_service_info(device))
+        assert "AA:BB:CC:DD:EE:FF" in fleet
+        assert fleet.get_device("AA:BB:CC:DD:EE:FF") is not None
+        fleet.remove_device("aa:bb:cc:dd:ee:ff")
+        assert "AA:BB:CC:DD:EE:FF" not in fleet
+        fleet.update(_service_info(device))
+        assert fleet.update(_service_info(device))
+        assert len(fleet) == 1
+
+    def test_configured_keys_take_precedence(self) -> None:
+        """Configured addresses never switch to a candidate key."""
+        address = "AA:BB:CC:DD:EE:FF"
+        fleet = VictronBluetoothFleet(
+            {address: DEVICES["solar_charger"]["key"]},
+            candidate_keys=[DEVICES["vebus"]["key"]],
+        )
+        update = fleet.update(make_service_info("vebus"))
+        assert update is not None
+        assert not any(key.key == "ac_in_power" for key in update.entity_values)
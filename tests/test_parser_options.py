@@ -0,0 +1,452 @@
+"""Tests for the optional features of VictronBluetoothDeviceData."""
+
+import random
+
+from typing import Any
+
+import pytest
+from sensor_state_data import DeviceKey, SensorUpdate, SensorValue
+from victron_ble.devices import BatteryMonitor, DcEnergyMeter, Device, SmartLithium
+
+from victron_ble_ha_parser import (
+    SimulatedDevice,
+    VictronBluetoothDeviceData,
+    WindowStats,
+)
+from victron_ble_ha_parser import parser as parser_module
+from victron_ble_ha_parser.parser import MAX_INTEGRATION_GAP, METRICS
+
+from .fixtures import DEVICES, make_service_info, make_service_info_with_data
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """Replace the parser's monotonic clock with one the test advances."""
+    now = [0.0]
+    monkeypatch.setattr(parser_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _values(update: SensorUpdate) -> dict[str, Any]:
+    """Map the sensor keys of an update to their native values."""
+    return {key.key: value.native_value for key, value in update.entity_values.items()}
+
+
+def _simulated(parser: type[Device]) -> SimulatedDevice:
+    """Simulate a device of the given type with a fixed seed."""
+    return SimulatedDevice(
+        parser,
+        "AA:BB:CC:DD:EE:FF",
+        "00112233445566778899aabbccddeeff",
+        random.Random(0),
+    )
+
+
+class TestKeyRotation:
+    """A replaced key keeps being accepted during its rotation window."""
+
+    def test_previous_key_accepted_until_switch(self) -> None:
+        """Old advertisements decode until the device uses the new key."""
+        device = VictronBluetoothDeviceData(DEVICES["solar_charger"]["key"])
+        device.set_advertisement_key(DEVICES["vebus"]["key"], rotation_window=60)
+        old = bytes.fromhex(DEVICES["solar_charger"]["advertisement"])
+        new = bytes.fromhex(DEVICES["vebus"]["advertisement"])
+        assert device.decode_reading(old) is not None
+        assert device.decode_reading(new) is not None
+        assert device.decode_reading(old) is None
+
+    def test_no_window(self) -> None:
+        """Without a rotation window the previous key is dropped at once."""
+        device = VictronBluetoothDeviceData(DEVICES["solar_charger"]["key"])
+        device.set_advertisement_key(DEVICES["vebus"]["key"])
+        assert not device.validate_advertisement_key(
+            bytes.fromhex(DEVICES["solar_charger"]["advertisement"])
+        )
+
+
+class TestDedupeCache:
+    """Repeated advertisements are served from the opt-in dedupe cache."""
+
+    def _count_decrypts(self, monkeypatch: pytest.MonkeyPatch) -> list[int]:
+        calls = [0]
+        decrypt = parser_module._decrypt
+
+        def counting_decrypt(*args):  # type: ignore[no-untyped-def]
+            calls[0] += 1
+            return decrypt(*args)
+
+        monkeypatch.setattr(parser_module, "_decrypt", counting_decrypt)
+        return calls
+
+    def test_repeat_skips_decryption(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """A byte-identical advertisement is not decrypted a second time."""
+        calls = self._count_decrypts(monkeypatch)
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], dedupe_cache_size=4
+        )
+        update1 = device.update(make_service_info("battery_monitor"))
+        update1_values = dict(update1.entity_values)
+        update2 = device.update(make_service_info("battery_monitor"))
+        assert calls[0] == 1
+        assert update2.entity_values == update1_values
+
+    def test_disabled_by_default(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Without a cache size every advertisement is decrypted."""
+        calls = self._count_decrypts(monkeypatch)
+        device = VictronBluetoothDeviceData(DEVICES["battery_monitor"]["key"])
+        device.update(make_service_info("battery_monitor"))
+        device.update(make_service_info("battery_monitor"))
+        assert calls[0] == 2
+
+    def test_least_recently_used_evicted(self) -> None:
+        """The cache never holds more than dedupe_cache_size payloads."""
+        # The SmartShunt and DC energy meter fixtures share a key
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], dedupe_cache_size=1
+        )
+        device.update(make_service_info("battery_monitor"))
+        device.update(make_service_info("dc_energy_meter"))
+        assert list(device._dedupe_cache) == [
+            bytes.fromhex(DEVICES["dc_energy_meter"]["advertisement"])
+        ]
+
+
+class TestDeltaUpdates:
+    """Delta updates only carry sensors whose value changed."""
+
+    @staticmethod
+    def _keys(update) -> set[str]:  # type: ignore[no-untyped-def]
+        return {
+            device_key.key
+            for device_key in update.entity_values
+            if device_key.key != "signal_strength"
+        }
+
+    def test_repeat_is_empty(self) -> None:
+        """A repeated advertisement reports no sensors after the first."""
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], delta_updates=True
+        )
+        assert len(self._keys(device.update(make_service_info("battery_monitor"))))
+        assert self._keys(device.update(make_service_info("battery_monitor"))) == set()
+
+    def test_deadband(self) -> None:
+        """Numeric changes within the deadband of their device class are dropped."""
+        # Same key; voltage differs by 0.01 V and the alarm goes from
+        # no_alarm to None between the SmartShunt and DC energy meter fixtures.
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], delta_updates=True
+        )
+        device.update(make_service_info("battery_monitor"))
+        update = device.update(make_service_info("dc_energy_meter"))
+        assert "voltage" not in self._keys(update)
+        assert "alarm" in self._keys(update)
+        assert "meter_type" in self._keys(update)
+
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], delta_updates=True, deadbands={}
+        )
+        device.update(make_service_info("battery_monitor"))
+        update = device.update(make_service_info("dc_energy_meter"))
+        assert "voltage" in self._keys(update)
+
+    def test_full_refresh(self) -> None:
+        """Every sensor is reported again once the refresh interval elapses."""
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"],
+            delta_updates=True,
+            full_refresh_interval=0,
+        )
+        first = self._keys(device.update(make_service_info("battery_monitor")))
+        assert self._keys(device.update(make_service_info("battery_monitor"))) == first
+
+
+class TestSupportedHasNoSideEffects:
+    """supported() decodes an advertisement without touching update() state."""
+
+    def test_delta_updates(self) -> None:
+        """A packet checked with supported() is still reported by update()."""
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], delta_updates=True
+        )
+        info = make_service_info("battery_monitor")
+        assert device.supported(info)
+        assert "voltage" in _values(device.update(info))
+
+    def test_aggregation(self, clock: list[float]) -> None:
+        """supported() does not add samples to the aggregation window."""
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], aggregation_window=10.0
+        )
+        info = make_service_info("battery_monitor")
+        device.supported(info)
+        device.update(info)
+        clock[0] = 10.0
+        device.supported(info)
+        device.update(info)
+        assert device.window_statistics()["voltage"].samples == 2
+
+    def test_integration(self, clock: list[float]) -> None:
+        """supported() does not advance the net totals."""
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], derived_metrics=True
+        )
+        device.supported(make_service_info("battery_monitor"))
+        assert device._integrators == {}
+
+
+class TestMetrics:
+    """Update counters and stage timings are only kept when enabled."""
+
+    def test_disabled_by_default(self) -> None:
+        """Without enable_metrics the snapshot is empty."""
+        device = VictronBluetoothDeviceData(DEVICES["battery_monitor"]["key"])
+        device.update(make_service_info("battery_monitor"))
+        assert device.metrics() == {}
+
+    def test_outcomes_and_timings(self) -> None:
+        """Each update counts one outcome and successful ones time every stage."""
+        key = DEVICES["battery_monitor"]["key"]
+        device = VictronBluetoothDeviceData(key, enable_metrics=True)
+        device.update(make_service_info("battery_monitor"))
+        device.update(make_service_info_with_data(b"\x00"))
+        device.update(make_service_info("solar_charger"))
+        metrics = device.metrics()
+        assert set(metrics) == set(METRICS)
+        assert metrics["packets"] == 3
+        assert metrics["parsed"] == 1
+        assert metrics["not_instant_readout"] == 1
+        assert metrics["key_mismatches"] == 1
+        for stage in ("detect_ns", "validate_ns", "decrypt_ns", "update_ns"):
+            assert metrics[stage] > 0
+
+    def test_supported_not_counted(self) -> None:
+        """supported() before update() does not count the packet twice."""
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], enable_metrics=True
+        )
+        info = make_service_info("battery_monitor")
+        device.supported(info)
+        device.update(info)
+        metrics = device.metrics()
+        assert metrics["packets"] == metrics["parsed"] == 1
+
+    def test_snapshot_is_a_copy(self) -> None:
+        """Later updates do not change a snapshot already taken."""
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], enable_metrics=True
+        )
+        snapshot = device.metrics()
+        device.update(make_service_info("battery_monitor"))
+        assert snapshot["packets"] == 0
+
+
+class TestWindowedAggregation:
+    """Sensor values are consolidated into one update per aggregation window."""
+
+    def _updates(
+        self, clock: list[float], device_ids: list[str], step: float
+    ) -> tuple[VictronBluetoothDeviceData, list[dict[str, Any]]]:
+        device = VictronBluetoothDeviceData(
+            DEVICES["battery_monitor"]["key"], aggregation_window=10.0
+        )
+        updates = []
+        for device_id in device_ids:
+            updates.append(_values(device.update(make_service_info(device_id))))
+            clock[0] += step
+        return device, updates
+
+    def test_one_update_per_window(self, clock: list[float]) -> None:
+        """Samples within the window are held back and reported together."""
+        device_ids = ["battery_monitor", "dc_energy_meter"] * 3
+        device, updates = self._updates(clock, device_ids, 4.0)
+        # the window starts at the first sample and closes at t=12
+        assert [len(update) for update in updates[:3]] == [1, 1, 1]
+        assert updates[3]["voltage"] == pytest.approx(12.525)
+        assert updates[3]["aux_mode"] == "starter_voltage"
+        assert updates[3]["remaining_minutes"] is None
+        stats = device.window_statistics()
+        assert stats["voltage"] == WindowStats(
+            12.52, 12.53, pytest.approx(12.525), 12.52, 4
+        )
+        assert "aux_mode" not in stats
+        assert len(updates[4]) == 1
+
+    def test_accumulators_reset_per_window(self, clock: list[float]) -> None:
+        """Each window only reports the samples received since the last one."""
+        device_ids = ["battery_monitor", "dc_energy_meter", "battery_monitor"]
+        device, updates = self._updates(clock, device_ids, 10.0)
+        assert updates[1]["voltage"] == pytest.approx(12.525)
+        assert updates[2]["voltage"] == 12.53
+        assert device.window_statistics()["voltage"].samples == 1
+
+    def test_disabled_by_default(self) -> None:
+        """Without a window every update reports its own values."""
+        device = VictronBluetoothDeviceData(DEVICES["battery_monitor"]["key"])
+        update = device.update(make_service_info("battery_monitor"))
+        assert len(update.entity_values) > 1
+        assert device.window_statistics() == {}
+
+
+class TestDerivedMetrics:
+    """Opt-in sensors computed from the decoded values of each packet."""
+
+    def test_power(self) -> None:
+        """Power is the product of the decoded voltage and current."""
+        device = VictronBluetoothDeviceData(
+            DEVICES["orion_xs"]["key"], derived_metrics=True
+        )
+        values = _values(device.update(make_service_info("orion_xs")))
+        assert values["input_power"] == 72.0
+        assert values["output_power"] == 69.4
+
+    def test_disabled_by_default(self) -> None:
+        """Without derived_metrics only the decoded sensors are reported."""
+        device = VictronBluetoothDeviceData(DEVICES["battery_monitor"]["key"])
+        update = device.update(make_service_info("battery_monitor"))
+        assert DeviceKey("power") not in update.entity_values
+        assert DeviceKey("net_energy") not in update.entity_values
+
+    def test_cell_statistics(self) -> None:
+        """Cells without a reading are skipped and out-of-range cells have no delta."""
+        cells = [3.3, None, 3.25, 3.31, None, None, None, None]
+        values = {
+            device_key: SensorValue(device_key=device_key, name="", native_value=cell)
+            for device_key, cell in zip(parser_module._CELL_VOLTAGE_KEYS, cells)
+        }
+        lowest, highest, delta = parser_module._cell_statistics(values)
+        assert (lowest, highest, delta) == (3.25, 3.31, 0.06)
+        cells[1] = float("inf")
+        values = {
+            device_key: SensorValue(device_key=device_key, name="", native_value=cell)
+            for device_key, cell in zip(parser_module._CELL_VOLTAGE_KEYS, cells)
+        }
+        assert parser_module._cell_statistics(values) == (3.25, float("inf"), None)
+
+    def test_integrator(self) -> None:
+        """Samples are integrated per hour and long gaps are left out."""
+        integrator = parser_module._Integrator()
+        assert integrator.add(0.0, 10.0) == 0.0
+        assert integrator.add(36.0, 20.0) == pytest.approx(0.15)
+        assert integrator.add(36.0 + MAX_INTEGRATION_GAP + 1, 20.0) == (
+            pytest.approx(0.15)
+        )
+        assert integrator.add(36.0 + MAX_INTEGRATION_GAP + 1, None) == (
+            pytest.approx(0.15)
+        )
+
+    @pytest.mark.parametrize("parser", [BatteryMonitor, DcEnergyMeter])
+    def test_battery_power_and_net_totals(
+        self, parser: type[Device], clock: list[float]
+    ) -> None:
+        """Power and the net totals follow the decoded voltage and current."""
+        simulated = _simulated(parser)
+        device = VictronBluetoothDeviceData(
+            simulated.advertisement_key, derived_metrics=True
+        )
+        decoded = VictronBluetoothDeviceData(simulated.advertisement_key)
+        net_ampere_hours = net_energy = 0.0
+        previous: tuple[float, float] | None = None
+        for now in (0.0, 36.0, 72.0):
+            clock[0] = now
+            info = make_service_info_with_data(simulated.advertisement())
+            values = _values(device.update(info))
+            voltage, current = (
+                _values(decoded.update(info))[key] for key in ("voltage", "current")
+            )
+            # voltage in 0.01 V and current in mA, multiplied without rounding
+            power = round(voltage * 100) * round(current * 1000) / 100_000
+            assert values["power"] == power
+            if previous is not None:
+                net_ampere_hours += (previous[0] + current) / 2 * 36 / 3600
+                net_energy += (previous[1] + power) / 2 * 36 / 3600
+            previous = current, power
+            assert values["net_ampere_hours"] == pytest.approx(net_ampere_hours)
+            assert values["net_energy"] == pytest.approx(net_energy)
+        assert net_ampere_hours != 0.0
+
+        device.reset_integrators()
+        clock[0] = 108.0
+        values = _values(
+            device.update(make_service_info_with_data(simulated.advertisement()))
+        )
+        assert values["net_ampere_hours"] == values["net_energy"] == 0.0
+
+    def test_cell_statistics_update(self) -> None:
+        """The cell statistics of a Smart Lithium come with each update."""
+        simulated = _simulated(SmartLithium)
+        device = VictronBluetoothDeviceData(
+            simulated.advertisement_key, derived_metrics=True
+        )
+        for _ in range(5):
+            values = _values(
+                device.update(make_service_info_with_data(simulated.advertisement()))
+            )
+            cells = [values[f"cell_{i + 1}_voltage"] for i in range(8)]
+            assert values["min_cell_voltage"] == min(cells)
+            assert values["max_cell_voltage"] == max(cells)
+            # cell voltages in 0.01 V, subtracted without rounding
+            delta = (round(max(cells) * 100) - round(min(cells) * 100)) / 100
+            assert values["cell_voltage_delta"] == delta
+
+
+class TestAggregatedTotals:
+    """Running totals pass through an aggregation window by their last value."""
+
+    def test_net_totals_not_averaged(self, clock: list[float]) -> None:
+        """The window reports the integrator total, not its mean over the window."""
+        simulated = _simulated(BatteryMonitor)
+        device = VictronBluetoothDeviceData(
+            simulated.advertisement_key,
+            derived_metrics=True,
+            aggregation_window=72.0,
+        )
+        for now in (0.0, 36.0, 72.0):
+            clock[0] = now
+            values = _values(
+                device.update(make_service_info_with_data(simulated.advertisement()))
+            )
+        assert device._integrators is not None
+        total = device._integrators[DeviceKey("net_ampere_hours")].total
+        assert total != 0.0
+        assert values["net_ampere_hours"] == total
+        assert device.window_statistics()["net_ampere_hours"].last == total
+
+
+class TestLogThrottling:
+    """Repeated packet-path log messages are summarized, not logged each time."""
+
+    def test_repeats_are_counted(
+        self, clock: list[float], caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Only the first message per interval is logged, then a count."""
+        device = VictronBluetoothDeviceData(DEVICES["battery_monitor"]["key"])
+        wrong_key = bytes.fromhex(DEVICES["solar_charger"]["advertisement"])
+        with caplog.at_level("ERROR"):
+            for _ in range(5):
+                device.validate_advertisement_key(wrong_key)
+            assert len(caplog.records) == 1
+
+            clock[0] += parser_module.LOG_INTERVAL
+            device.validate_advertisement_key(wrong_key)
+        assert len(caplog.records) == 2
+        assert "repeated 4 times" in caplog.records[1].getMessage()
+
+    def test_disabled_level_skips_formatting(
+        self, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        """Advertisements are not hex-formatted unless debug logging is on."""
+        formatted = []
+        monkeypatch.setattr(
+            parser_module._LazyHex,
+            "__str__",
+            lambda self: formatted.append(self) or "",
+        )
+        device = VictronBluetoothDeviceData(DEVICES["battery_monitor"]["key"])
+        unsupported = make_service_info_with_data(b"\x10\x00\x00\x00\xff")
+        with caplog.at_level("INFO"):
+            device.update(unsupported)
+        assert formatted == []
+        with caplog.at_level("DEBUG"):
+            device.update(unsupported)
+        assert formatted
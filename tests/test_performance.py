@@ -0,0 +1,158 @@
+"""Micro-benchmarks guarding the cost of the per-packet hot path."""
+
+import random
+import subprocess
+import sys
+import timeit
+
+import pytest
+from home_assistant_bluetooth import BluetoothServiceInfo
+from victron_ble.devices import SmartLithium
+from victron_ble.devices.base import AdvertisementContainer
+
+from victron_ble_ha_parser import SimulatedDevice, VictronBluetoothDeviceData
+from victron_ble_ha_parser import parser as parser_module
+
+from .fixtures import DEVICES, make_service_info, make_service_info_with_data
+
+
+def _dispatch_cases() -> dict[str, tuple[str, BluetoothServiceInfo]]:
+    """Return the key and service info of every supported device type."""
+    cases = {
+        device_id: (device["key"], make_service_info(device_id))
+        for device_id, device in DEVICES.items()
+    }
+    # Smart Lithium has no fixture, so simulate one
+    key = "00112233445566778899aabbccddeeff"
+    device = SimulatedDevice(SmartLithium, "AA:BB:CC:DD:EE:FF", key, random.Random(0))
+    cases["smart_lithium"] = (key, make_service_info_with_data(device.advertisement()))
+    return cases
+
+
+class TestDispatch:
+    """Device dispatch must cost the same whichever device type is detected."""
+
+    def test_dispatch_cost_is_flat(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Handling a packet of the last device types is no slower than the first.
+
+        Times the whole _update_from_advertisement() path per device type,
+        with decryption replaced by a lookup of the plaintext so the AES share
+        does not mask the rest.
+        """
+        decrypt = parser_module._decrypt
+        plaintexts: dict[bytes, bytes] = {}
+
+        def cached_decrypt(container: AdvertisementContainer, key: bytes) -> bytes:
+            encrypted = bytes(container.encrypted_data)
+            if encrypted not in plaintexts:
+                plaintexts[encrypted] = decrypt(container, key)
+            return plaintexts[encrypted]
+
+        monkeypatch.setattr(parser_module, "_decrypt", cached_decrypt)
+        timings = {}
+        for device_id, (key, info) in _dispatch_cases().items():
+            device = VictronBluetoothDeviceData(key)
+            device.update(info)
+            assert device._sensor_values_updates, device_id
+            timings[device_id] = min(
+                timeit.repeat(
+                    lambda device=device, info=info: (
+                        device._update_from_advertisement(info, None)
+                    ),
+                    number=500,
+                    repeat=5,
+                )
+            )
+        # The remaining spread of about 2.5x comes from victron-ble's decoding
+        # and the number of sensors of each type; the bound leaves room for
+        # noisy CI runners while catching per-type work in the dispatch.
+        assert max(timings.values()) < 4 * min(timings.values()), timings
+
+
+# Self time of the package's own modules in microseconds, which is about
+# 40 ms on a desktop CPU.
+OWN_MODULES_IMPORT_BUDGET_US = 100_000
+
+# Importing the parser takes about 170 ms, nearly all of it in the
+# dependencies below, which swing by half again from run to run on a busy
+# host. They are imported before the clock starts, so the budget covers the
+# package's own import work, about 25 ms, and any dependency added later.
+PARSER_IMPORT_DEPENDENCIES = (
+    "asyncio",
+    "bluetooth_sensor_state_data",
+    "Crypto.Cipher.AES",
+    "Crypto.Util.Padding",
+    "Crypto.Util.strxor",
+    "home_assistant_bluetooth",
+    "mmap",
+    "sensor_state_data",
+    "victron_ble.devices",
+)
+PARSER_IMPORT_BUDGET_US = 60_000
+PARSER_IMPORT_RUNS = 3
+
+
+def _import_times(statement: str) -> dict[str, tuple[int, int]]:
+    """Run an import in a fresh interpreter and return its -X importtime log.
+
+    Maps each module to its (self, cumulative) import time in microseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:") :].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def _import_wall_time(statement: str, preload: tuple[str, ...] = ()) -> int:
+    """Run an import in a fresh interpreter and return its time in microseconds.
+
+    The preload modules are imported before the clock starts.
+    """
+    script = (
+        "".join(f"import {module}\n" for module in preload) + "import time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print(int((time.perf_counter() - start) * 1e6))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, check=True, text=True
+    )
+    return int(result.stdout)
+
+
+class TestImportTime:
+    """Importing the package stays cheap on the Home Assistant startup path."""
+
+    def test_own_modules_budget(self) -> None:
+        """The package's own modules stay within their import time budget."""
+        times = _import_times(
+            "import victron_ble_ha_parser.batch, victron_ble_ha_parser.capture,"
+            " victron_ble_ha_parser.fleet, victron_ble_ha_parser.stream"
+        )
+        own = {
+            module: self_us
+            for module, (self_us, _) in times.items()
+            if module.startswith("victron_ble_ha_parser")
+        }
+        assert "concurrent.futures.process" not in times
+        assert sum(own.values()) < OWN_MODULES_IMPORT_BUDGET_US, own
+
+    def test_parser_import_budget(self) -> None:
+        """Importing the parser, as the integration does, stays within budget."""
+        elapsed = min(
+            _import_wall_time(
+                "from victron_ble_ha_parser import VictronBluetoothDeviceData",
+                PARSER_IMPORT_DEPENDENCIES,
+            )
+            for _ in range(PARSER_IMPORT_RUNS)
+        )
+        assert elapsed < PARSER_IMPORT_BUDGET_US, elapsed
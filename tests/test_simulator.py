@@ -0,0 +1,112 @@
+"""Tests for the advertisement simulator."""
+
+import pytest
+from victron_ble.devices import BatteryMonitor
+
+from victron_ble_ha_parser import (
+    AdvertisementSimulator,
+    SimulatedDevice,
+    VictronBluetoothDeviceData,
+    VictronBluetoothFleet,
+    parse_advertisements,
+)
+from victron_ble_ha_parser.parser import _DEVICE_SENSORS
+
+
+class TestSimulatedDevice:
+    """Simulated advertisements decode like real ones."""
+
+    @pytest.mark.parametrize("parser", list(_DEVICE_SENSORS), ids=lambda p: p.__name__)
+    def test_decodes(self, parser: type) -> None:
+        """Both victron-ble and the parser decode every supported device type."""
+        key = "00112233445566778899aabbccddeeff"
+        device = SimulatedDevice(parser, "AA:BB:CC:DD:EE:FF", key)
+        for _ in range(5):
+            data = device.advertisement()
+            parser(key).parse(data)
+            reading = VictronBluetoothDeviceData(key).decode_reading(data)
+            assert type(reading).__name__ == f"{parser.__name__}Reading"
+
+    def test_readings_change(self) -> None:
+        """Each reading uses a new IV and drifts the values."""
+        key = "00112233445566778899aabbccddeeff"
+        device = SimulatedDevice(BatteryMonitor, "AA:BB:CC:DD:EE:FF", key)
+        decoder = VictronBluetoothDeviceData(key)
+        first = device.advertisement()
+        second = device.advertisement()
+        assert first[5:7] != second[5:7]
+        assert device.last_advertisement == second
+        assert decoder.decode_reading(first) != decoder.decode_reading(second)
+
+    def test_unsupported_type(self) -> None:
+        """Device types the parser does not support are rejected."""
+        with pytest.raises(ValueError):
+            SimulatedDevice(object, "AA:BB:CC:DD:EE:FF", "00" * 16)  # type: ignore
+
+
+class TestAdvertisementSimulator:
+    """The simulator interleaves devices with duplicates and malformed packets."""
+
+    def test_devices_and_keys(self) -> None:
+        """Devices get unique addresses and keys and cycle through the types."""
+        simulator = AdvertisementSimulator(devices=30, seed=1)
+        keys = simulator.advertisement_keys()
+        assert len(keys) == len(set(keys.values())) == 30
+        assert {device.parser for device in simulator.devices} == set(_DEVICE_SENSORS)
+
+    def test_reproducible(self) -> None:
+        """The same seed produces the same packets."""
+        first = list(AdvertisementSimulator(seed=7).advertisements(50))
+        second = list(AdvertisementSimulator(seed=7).advertisements(50))
+        assert first == second
+
+    def test_every_packet_decodes(self) -> None:
+        """Without duplicates or malformed packets everything decodes."""
+        simulator = AdvertisementSimulator(devices=25, seed=2)
+        readings = parse_advertisements(
+            simulator.advertisements(500), simulator.advertisement_keys()
+        )
+        assert None not in readings
+
+    def test_ratios(self) -> None:
+        """Duplicates repeat a payload and malformed packets fail to decode."""
+        simulator = AdvertisementSimulator(
+            devices=5, duplicate_ratio=0.3, malformed_ratio=0.1, seed=3
+        )
+        packets = list(simulator.advertisements(5000))
+        readings = parse_advertisements(packets, simulator.advertisement_keys())
+        failures = readings.count(None) / len(readings)
+        assert 0.07 < failures < 0.13
+        duplicates = sum(
+            1 for previous, packet in zip(packets, packets[5:]) if previous == packet
+        )
+        assert 0.2 < duplicates / len(packets) < 0.35
+
+    def test_invalid_ratios(self) -> None:
+        """Ratios must be between 0 and 1 in total."""
+        with pytest.raises(ValueError):
+            AdvertisementSimulator(duplicate_ratio=0.6, malformed_ratio=0.6)
+        with pytest.raises(ValueError):
+            AdvertisementSimulator(devices=0)
+
+    def test_service_infos(self) -> None:
+        """Service infos carry the packets and feed a fleet directly."""
+        simulator = AdvertisementSimulator(devices=11, seed=4)
+        fleet = VictronBluetoothFleet(simulator.advertisement_keys())
+        updates = [fleet.update(info) for info in simulator.service_infos(33)]
+        assert all(update is not None for update in updates)
+
+    def test_rate(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """A rate paces the packets by sleeping until each one is due."""
+        from victron_ble_ha_parser import simulator as simulator_module
+
+        clock = [0.0]
+
+        def sleep(seconds: float) -> None:
+            clock[0] += seconds
+
+        monkeypatch.setattr(simulator_module.time, "monotonic", lambda: clock[0])
+        monkeypatch.setattr(simulator_module.time, "sleep", sleep)
+        simulator = AdvertisementSimulator(seed=5)
+        assert len(list(simulator.service_infos(101, rate=100.0))) == 101
+        assert clock[0] == pytest.approx(1.0)
@@ -0,0 +1,116 @@
+"""Tests for the asyncio advertisement stream."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sensor_state_data import DeviceKey
+
+from victron_ble_ha_parser import (
+    Keys,
+    OverflowPolicy,
+    StreamUpdate,
+    VictronAdvertisementStream,
+    VictronBluetoothFleet,
+)
+
+from .fixtures import DEVICES, make_service_info
+
+_FLEET_KEYS = {
+    "AA:00:00:00:00:01": DEVICES["solar_charger"]["key"],
+    "AA:00:00:00:00:02": DEVICES["battery_monitor"]["key"],
+}
+
+
+def _collect(stream: VictronAdvertisementStream) -> list[StreamUpdate]:
+    async def consume() -> list[StreamUpdate]:
+        return [update async for update in stream]
+
+    return asyncio.run(consume())
+
+
+class TestVictronAdvertisementStream:
+    """Advertisements put on the stream come out as decoded updates."""
+
+    def test_updates_in_order(self) -> None:
+        """Each queued advertisement yields a detached update in order."""
+        stream = VictronAdvertisementStream(VictronBluetoothFleet(_FLEET_KEYS))
+        stream.put_nowait(make_service_info("solar_charger", "AA:00:00:00:00:01"))
+        stream.put_nowait(make_service_info("battery_monitor", "AA:00:00:00:00:02"))
+        stream.put_nowait(make_service_info("solar_charger", "AA:00:00:00:00:03"))
+        stream.close()
+
+        updates = _collect(stream)
+        assert [update.address for update in updates] == [
+            "AA:00:00:00:00:01",
+            "AA:00:00:00:00:02",
+        ]
+        # The first update must not have been cleared by the second one
+        assert updates[0].update.entity_values[
+            DeviceKey(Keys.BATTERY_VOLTAGE, None)
+        ].native_value == pytest.approx(13.88)
+
+    def test_large_batches_use_executor(self) -> None:
+        """Batches at or over executor_batch_size are decoded in the executor."""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            stream = VictronAdvertisementStream(
+                VictronBluetoothFleet(_FLEET_KEYS),
+                batch_size=8,
+                executor_batch_size=4,
+                executor=executor,
+            )
+            for _ in range(10):
+                stream.put_nowait(
+                    make_service_info("solar_charger", "AA:00:00:00:00:01")
+                )
+            stream.close()
+            assert len(_collect(stream)) == 10
+
+    def test_drop_oldest(self) -> None:
+        """A full stream discards its oldest advertisement."""
+        stream = VictronAdvertisementStream(
+            VictronBluetoothFleet(_FLEET_KEYS), maxsize=1
+        )
+        stream.put_nowait(make_service_info("solar_charger", "AA:00:00:00:00:01"))
+        stream.put_nowait(make_service_info("battery_monitor", "AA:00:00:00:00:02"))
+        stream.close()
+        assert stream.dropped == 1
+        assert [update.address for update in _collect(stream)] == ["AA:00:00:00:00:02"]
+
+    def test_coalesce(self) -> None:
+        """Advertisements from the same address replace each other."""
+        stream = VictronAdvertisementStream(
+            VictronBluetoothFleet(_FLEET_KEYS), overflow=OverflowPolicy.COALESCE
+        )
+        for _ in range(3):
+            stream.put_nowait(make_service_info("solar_charger", "AA:00:00:00:00:01"))
+        stream.put_nowait(make_service_info("battery_monitor", "AA:00:00:00:00:02"))
+        stream.close()
+        assert stream.dropped == 2
+        assert len(_collect(stream)) == 2
+
+    def test_block(self) -> None:
+        """Under BLOCK, put() waits until the consumer makes room."""
+
+        async def run() -> int:
+            stream = VictronAdvertisementStream(
+                VictronBluetoothFleet(_FLEET_KEYS),
+                maxsize=1,
+                overflow=OverflowPolicy.BLOCK,
+            )
+            info = make_service_info("solar_charger", "AA:00:00:00:00:01")
+            stream.put_nowait(info)
+            with pytest.raises(asyncio.QueueFull):
+                stream.put_nowait(info)
+
+            async def produce() -> None:
+                for _ in range(3):
+                    await stream.put(info)
+                stream.close()
+
+            producer = asyncio.create_task(produce())
+            received = [update async for update in stream]
+            await producer
+            return len(received)
+
+        assert asyncio.run(run()) == 4
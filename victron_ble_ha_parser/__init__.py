@@ -1,12 +1,42 @@
 """A parser module for use by Home Assistant."""
 
+from .batch import (
+    ColumnarReadings,
+    parse_advertisements,
+    parse_advertisements_columnar,
+    parse_advertisements_parallel,
+)
+from .capture import CaptureReader, CaptureRecord, CaptureWriter
 from .custom_state_data import SensorDeviceClass, Units, Keys
-from .parser import VictronBluetoothDeviceData, detect_device_type
+from .fleet import VictronBluetoothFleet
+from .parser import (
+    VictronBluetoothDeviceData,
+    VictronReading,
+    WindowStats,
+    detect_device_type,
+)
+from .simulator import AdvertisementSimulator, SimulatedDevice
+from .stream import OverflowPolicy, StreamUpdate, VictronAdvertisementStream
 
 __all__ = [
+    "AdvertisementSimulator",
+    "CaptureReader",
+    "CaptureRecord",
+    "CaptureWriter",
+    "ColumnarReadings",
     "Keys",
+    "OverflowPolicy",
     "Units",
     "SensorDeviceClass",
+    "StreamUpdate",
+    "VictronAdvertisementStream",
     "VictronBluetoothDeviceData",
+    "VictronBluetoothFleet",
+    "SimulatedDevice",
+    "VictronReading",
+    "WindowStats",
     "detect_device_type",
+    "parse_advertisements",
+    "parse_advertisements_columnar",
+    "parse_advertisements_parallel",
 ]
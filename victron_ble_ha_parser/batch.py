@@ -0,0 +1,225 @@
+"""Bulk decoding of captured Victron advertisements without Home Assistant objects."""
+
+from array import array
+from collections import defaultdict, deque
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import Future
+from enum import Enum
+from functools import cache
+from itertools import islice
+from os import cpu_count
+from struct import error as struct_error
+from typing import Any, NamedTuple
+
+from victron_ble.devices import detect_device_type
+from victron_ble.devices.base import AdvertisementContainer, Device
+
+from .custom_state_data import Keys
+from .parser import (
+    _DEVICE_SENSORS,
+    Buffer,
+    _decode_advertisement_key,
+    _decrypt_many,
+    _enum_names,
+    _is_candidate,
+    _read_container,
+)
+
+Reading = dict[Keys, Any]
+
+
+class ColumnarReadings(NamedTuple):
+    """Decoded readings of one device type, stored column by column.
+
+    columns holds a "timestamp" array of floats, an "address" list and one
+    array per sensor key. Numeric sensors are float arrays with NaN for
+    missing values. Enum sensors are int16 arrays of codes indexing into
+    categories[key], with -1 for missing values.
+    """
+
+    columns: dict[str, "array[Any] | list[str]"]
+    categories: dict[str, tuple[str | None, ...]]
+
+
+def parse_advertisements(
+    advertisements: Iterable[tuple[str, Buffer]],
+    keys: Mapping[str, str],
+) -> list[Reading | None]:
+    """Decode many (address, manufacturer data) pairs into sensor readings.
+
+    keys maps each device address to its advertisement key. The result lists
+    one reading per advertisement, in input order, holding the same values
+    VictronBluetoothDeviceData would report; advertisements that are not
+    instant readouts, come from unsupported devices or addresses without a
+    key, or do not match or decode with their key yield None.
+
+    Advertisements are grouped by device type and key first, so each group
+    sets up its device parser and key material once rather than per packet.
+    Manufacturer data may be memoryview slices of a larger buffer, which are
+    decoded in place. Raises ValueError if any key is malformed.
+    """
+    payloads = list(advertisements)
+    results: list[Reading | None] = [None] * len(payloads)
+    for index, parser, values in _decode_grouped(payloads, keys):
+        reading: Reading = {}
+        for field, value in zip(_DEVICE_SENSORS[parser], values):
+            if field.enum_names is not None:
+                value = field.enum_names.get(value)
+            reading[field.key] = value
+        results[index] = reading
+    return results
+
+
+def parse_advertisements_parallel(
+    advertisements: Iterable[tuple[str, bytes]],
+    keys: Mapping[str, str],
+    workers: int | None = None,
+    chunk_size: int = 10_000,
+) -> Iterator[Reading | None]:
+    """Decode advertisements like parse_advertisements() across processes.
+
+    The input is split into chunks of chunk_size that are decoded in a pool
+    of workers processes (default: one per CPU); the key map is sent to each
+    worker once when it starts. Readings are yielded in input order, and at
+    most two chunks per worker are in flight, so arbitrarily long streams
+    can be replayed in bounded memory.
+    """
+    # Deferred: loading the process pool machinery is slow and rarely needed
+    from concurrent.futures import ProcessPoolExecutor
+
+    for advertisement_key in keys.values():
+        _decode_advertisement_key(advertisement_key)
+    workers = workers or cpu_count() or 1
+    iterator = iter(advertisements)
+    in_flight: deque[Future[list[Reading | None]]] = deque()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(dict(keys),)
+    ) as executor:
+        while True:
+            while len(in_flight) < 2 * workers:
+                chunk = list(islice(iterator, chunk_size))
+                if not chunk:
+                    break
+                in_flight.append(executor.submit(_parse_chunk, chunk))
+            if not in_flight:
+                return
+            yield from in_flight.popleft().result()
+
+
+_worker_keys: dict[str, str] = {}
+
+
+def _init_worker(keys: dict[str, str]) -> None:
+    """Receive the key map once per worker process."""
+    global _worker_keys
+    _worker_keys = keys
+
+
+def _parse_chunk(chunk: list[tuple[str, bytes]]) -> list[Reading | None]:
+    """Decode one chunk inside a worker process."""
+    return parse_advertisements(chunk, _worker_keys)
+
+
+def parse_advertisements_columnar(
+    advertisements: Iterable[tuple[float, str, Buffer]],
+    keys: Mapping[str, str],
+) -> dict[str, ColumnarReadings]:
+    """Decode (timestamp, address, manufacturer data) rows into columns.
+
+    Returns one ColumnarReadings per device type name (as reported by
+    VictronBluetoothDeviceData), with rows in input order. Only successfully
+    decoded advertisements produce rows; one whose enum codes victron-ble
+    does not know is dropped like one that does not decrypt. The arrays
+    expose the buffer protocol, so numpy.frombuffer() can wrap them without
+    copying.
+    """
+    rows = list(advertisements)
+    decoded: defaultdict[type[Device], list[tuple[int, tuple[Any, ...]]]] = defaultdict(
+        list
+    )
+    for index, parser, row in _decode_grouped(
+        [(address, raw_data) for _, address, raw_data in rows], keys
+    ):
+        decoded[parser].append((index, row))
+
+    tables: dict[str, ColumnarReadings] = {}
+    for parser, entries in decoded.items():
+        entries.sort(key=lambda entry: entry[0])
+        columns: dict[str, array[Any] | list[str]] = {
+            "timestamp": array("d", (rows[index][0] for index, _ in entries)),
+            "address": [rows[index][1] for index, _ in entries],
+        }
+        categories: dict[str, tuple[str | None, ...]] = {}
+        for position, field in enumerate(_DEVICE_SENSORS[parser]):
+            values = [row[position] for _, row in entries]
+            if field.enum_type is not None:
+                codes = _enum_codes(field.enum_type)
+                columns[field.key] = array(
+                    "h", (-1 if value is None else codes[value] for value in values)
+                )
+                categories[field.key] = tuple(
+                    _enum_names(field.enum_type)[member] for member in field.enum_type
+                )
+            else:
+                columns[field.key] = array(
+                    "d",
+                    (float("nan") if value is None else value for value in values),
+                )
+        tables[parser.__name__] = ColumnarReadings(columns, categories)
+    return tables
+
+
+@cache
+def _enum_codes(enum_type: type[Enum]) -> dict[Enum, int]:
+    """Map each member of an enum to its position, used as its column code."""
+    return {member: code for code, member in enumerate(enum_type)}
+
+
+def _decode_grouped(
+    advertisements: list[tuple[str, Buffer]], keys: Mapping[str, str]
+) -> Iterator[tuple[int, type[Device], tuple[Any, ...]]]:
+    """Yield (index, parser, values) for each decodable advertisement.
+
+    values holds what each sensor getter of the device type returns. Results
+    come out grouped by device type and key, not in input order.
+    """
+    decoded_keys = {
+        address: _decode_advertisement_key(k) for address, k in keys.items()
+    }
+    groups: defaultdict[tuple[type[Device], bytes], list[int]] = defaultdict(list)
+
+    for index, (address, raw_data) in enumerate(advertisements):
+        key = decoded_keys.get(address)
+        if key is None or not _is_candidate(raw_data):
+            continue
+        try:
+            parser = detect_device_type(raw_data)  # type: ignore [arg-type]
+        except struct_error:
+            continue
+        if parser in _DEVICE_SENSORS:
+            groups[(parser, key)].append(index)
+
+    for (parser, key), indices in groups.items():
+        device = parser(key.hex())
+        data_type = device.data_type
+        key_check_byte = key[0]
+        matched: list[tuple[int, AdvertisementContainer]] = []
+        for index in indices:
+            try:
+                container = _read_container(advertisements[index][1])
+            except struct_error:
+                continue
+            encrypted_data = container.encrypted_data
+            if encrypted_data and encrypted_data[0] == key_check_byte:
+                matched.append((index, container))
+        decrypted = _decrypt_many([container for _, container in matched], key)
+        sensors = _DEVICE_SENSORS[parser]
+        for (index, container), payload in zip(matched, decrypted):
+            try:
+                data = data_type(container.model_id, device.parse_decrypted(payload))
+                # victron-ble builds some enums in the getters, which raise
+                # ValueError for codes it does not know
+                values = tuple(field.getter(data) for field in sensors)
+            except ValueError:
+                continue
+            yield index, parser, values
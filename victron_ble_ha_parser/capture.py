@@ -0,0 +1,257 @@
+"""Binary capture files of Victron advertisements, replayed through mmap.
+
+A capture file starts with an 8-byte header (magic, version) followed by
+records in time order. Each record is a 16-byte header holding the
+timestamp (float64 seconds), the 6-byte device address, the RSSI (int8) and
+the payload length (uint8), followed by the Victron manufacturer data.
+
+When the writer is closed it appends an index of (timestamp, offset) pairs,
+one every index_interval records, and a trailer pointing at it, so readers
+can seek to a time range without scanning the file. A file whose writer
+never closed (for example after a crash) has no index; the reader then
+builds one with a single pass over the records.
+"""
+
+import mmap
+
+from bisect import bisect_right
+from collections.abc import Iterator
+from os import PathLike
+from struct import Struct, error as struct_error
+from types import TracebackType
+from typing import BinaryIO, NamedTuple
+
+from home_assistant_bluetooth import BluetoothServiceInfo
+
+from .parser import VICTRON_IDENTIFIER, Buffer
+
+_MAGIC = b"VBLE"
+_VERSION = 1
+_INDEX_MAGIC = b"VIDX"
+_INDEX_INTERVAL = 1024
+
+# magic, version, reserved
+_FILE_HEADER = Struct("<4sHH")
+# timestamp, address, RSSI, payload length
+_RECORD_HEADER = Struct("<d6sbB")
+# timestamp and file offset of an indexed record
+_INDEX_ENTRY = Struct("<dQ")
+# index offset, index entry count, magic
+_TRAILER = Struct("<QQ4s")
+
+
+class CaptureRecord(NamedTuple):
+    """One advertisement read from a capture file.
+
+    data is a view into the mapped file; copy it with bytes() to keep the
+    payload without keeping the mapping alive.
+    """
+
+    timestamp: float
+    address: str
+    rssi: int
+    data: memoryview
+
+    def to_service_info(self) -> BluetoothServiceInfo:
+        """Build the BluetoothServiceInfo Home Assistant would have reported."""
+        return BluetoothServiceInfo(
+            name=self.address,
+            address=self.address,
+            rssi=self.rssi,
+            manufacturer_data={VICTRON_IDENTIFIER: bytes(self.data)},
+            service_data={},
+            service_uuids=[],
+            source="capture",
+        )
+
+
+class CaptureWriter:
+    """Append advertisements to a new capture file."""
+
+    def __init__(
+        self, path: str | PathLike[str], index_interval: int = _INDEX_INTERVAL
+    ) -> None:
+        """Create or truncate the capture file at path.
+
+        One index entry is written per index_interval records.
+        """
+        if index_interval <= 0:
+            raise ValueError("index_interval must be positive")
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(_FILE_HEADER.pack(_MAGIC, _VERSION, 0))
+        self._offset = _FILE_HEADER.size
+        self._index_interval = index_interval
+        self._index: list[tuple[float, int]] = []
+        self._count = 0
+        self._last_timestamp = float("-inf")
+
+    def __enter__(self) -> "CaptureWriter":
+        """Return the writer for use in a with statement."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the writer, writing its index."""
+        self.close()
+
+    def write(self, timestamp: float, address: str, rssi: int, data: Buffer) -> None:
+        """Append one advertisement.
+
+        Raises ValueError if the timestamp is earlier than the previous one,
+        the address is not a 6-byte MAC address or data exceeds 255 bytes.
+        """
+        if timestamp < self._last_timestamp:
+            raise ValueError("Capture records must be written in time order")
+        try:
+            raw_address = bytes.fromhex(address.replace(":", ""))
+        except ValueError:
+            raw_address = b""
+        if len(raw_address) != 6:
+            raise ValueError(f"Invalid address: {address}")
+        if len(data) > 255:
+            raise ValueError("Manufacturer data longer than 255 bytes")
+        if self._count % self._index_interval == 0:
+            self._index.append((timestamp, self._offset))
+        self._file.write(_RECORD_HEADER.pack(timestamp, raw_address, rssi, len(data)))
+        self._file.write(data)
+        self._offset += _RECORD_HEADER.size + len(data)
+        self._count += 1
+        self._last_timestamp = timestamp
+
+    def close(self) -> None:
+        """Write the index and trailer and close the file."""
+        if self._file.closed:
+            return
+        for entry in self._index:
+            self._file.write(_INDEX_ENTRY.pack(*entry))
+        self._file.write(_TRAILER.pack(self._offset, len(self._index), _INDEX_MAGIC))
+        self._file.close()
+
+
+class CaptureReader:
+    """Memory-map a capture file and iterate over its records.
+
+    Records are parsed straight out of the mapping, and their data is a
+    memoryview slice of it, so replay runs at the speed of the page cache.
+    They can be passed to VictronBluetoothDeviceData.decode_reading() or the
+    batch decoders as they are, or to update() via to_service_info().
+    """
+
+    def __init__(self, path: str | PathLike[str]) -> None:
+        """Open and map the capture file at path.
+
+        Raises ValueError if it is not a capture file.
+        """
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        try:
+            magic, version, _ = _FILE_HEADER.unpack_from(self._view)
+        except struct_error:
+            self.close()
+            raise ValueError("Not a Victron capture file") from None
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError("Not a Victron capture file")
+        self._end, self._index = self._read_index()
+
+    def __enter__(self) -> "CaptureReader":
+        """Return the reader for use in a with statement."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the reader."""
+        self.close()
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        """Iterate over every record in the file."""
+        return self.records()
+
+    def close(self) -> None:
+        """Unmap the file.
+
+        If record data views are still referenced, the mapping stays alive
+        until the last of them is garbage collected.
+        """
+        try:
+            self._view.release()
+            self._map.close()
+        except BufferError:
+            pass
+
+    def records(
+        self, start: float | None = None, end: float | None = None
+    ) -> Iterator[CaptureRecord]:
+        """Iterate over the records with start <= timestamp < end.
+
+        The index is used to skip straight to the first block that can hold
+        start; records are then scanned until end.
+        """
+        offset = _FILE_HEADER.size
+        if start is not None and self._index:
+            position = bisect_right(self._index, (start, -1)) - 1
+            if position >= 0:
+                offset = self._index[position][1]
+        for record in self._scan(offset):
+            if start is not None and record.timestamp < start:
+                continue
+            if end is not None and record.timestamp >= end:
+                return
+            yield record
+
+    def _scan(self, offset: int) -> Iterator[CaptureRecord]:
+        """Yield the records from offset up to the end of the record area."""
+        view = self._view
+        end = self._end
+        unpack_from = _RECORD_HEADER.unpack_from
+        header_size = _RECORD_HEADER.size
+        while offset + header_size <= end:
+            timestamp, raw_address, rssi, length = unpack_from(view, offset)
+            offset += header_size
+            if offset + length > end:
+                # record cut short by a crash while writing
+                return
+            yield CaptureRecord(
+                timestamp,
+                raw_address.hex(":").upper(),
+                rssi,
+                view[offset : offset + length],
+            )
+            offset += length
+
+    def _read_index(self) -> tuple[int, list[tuple[float, int]]]:
+        """Return the end of the record area and the time index."""
+        size = len(self._view)
+        if size >= _FILE_HEADER.size + _TRAILER.size:
+            index_offset, count, magic = _TRAILER.unpack_from(
+                self._view, size - _TRAILER.size
+            )
+            if (
+                magic == _INDEX_MAGIC
+                and index_offset + count * _INDEX_ENTRY.size + _TRAILER.size == size
+            ):
+                return index_offset, [
+                    _INDEX_ENTRY.unpack_from(
+                        self._view, index_offset + position * _INDEX_ENTRY.size
+                    )
+                    for position in range(count)
+                ]
+        # No index: the writer did not finish, so build one from the records
+        self._end = size
+        index = []
+        offset = _FILE_HEADER.size
+        for position, record in enumerate(self._scan(offset)):
+            if position % _INDEX_INTERVAL == 0:
+                index.append((record.timestamp, offset))
+            offset += _RECORD_HEADER.size + len(record.data)
+            record.data.release()
+        return offset, index
@@ -68,6 +68,7 @@ class Keys(sensor_state_data.enum.StrEnum):
     CELL_6_VOLTAGE = "cell_6_voltage"
     CELL_7_VOLTAGE = "cell_7_voltage"
     CELL_8_VOLTAGE = "cell_8_voltage"
+    CELL_VOLTAGE_DELTA = "cell_voltage_delta"
     CHARGE_STATE = "charge_state"
     CHARGER_ERROR = "charger_error"
     CONSUMED_AMPERE_HOURS = "consumed_ampere_hours"
@@ -76,19 +77,26 @@ class Keys(sensor_state_data.enum.StrEnum):
     ERROR_CODE = "error_code"
     EXTERNAL_DEVICE_LOAD = "external_device_load"
     INPUT_CURRENT = "input_current"
+    INPUT_POWER = "input_power"
     INPUT_VOLTAGE = "input_voltage"
+    MAX_CELL_VOLTAGE = "max_cell_voltage"
     METER_TYPE = "meter_type"
     MIDPOINT_VOLTAGE = "midpoint_voltage"
+    MIN_CELL_VOLTAGE = "min_cell_voltage"
+    NET_AMPERE_HOURS = "net_ampere_hours"
+    NET_ENERGY = "net_energy"
     OFF_REASON = "off_reason"
     OUTPUT_CURRENT = "output_current"
     OUTPUT_CURRENT_1 = "output_current_1"
     OUTPUT_CURRENT_2 = "output_current_2"
     OUTPUT_CURRENT_3 = "output_current_3"
+    OUTPUT_POWER = "output_power"
     OUTPUT_STATE = "output_state"
     OUTPUT_VOLTAGE = "output_voltage"
     OUTPUT_VOLTAGE_1 = "output_voltage_1"
     OUTPUT_VOLTAGE_2 = "output_voltage_2"
     OUTPUT_VOLTAGE_3 = "output_voltage_3"
+    POWER = "power"
     REMAINING_MINUTES = "remaining_minutes"
     SOLAR_POWER = "solar_power"
     STARTER_VOLTAGE = "starter_voltage"
@@ -0,0 +1,280 @@
+"""Routing of advertisements from many Victron devices to per-device parsers."""
+
+import math
+
+from collections.abc import Iterable, Iterator, Mapping
+from struct import error as struct_error
+from typing import Any, NamedTuple
+
+from home_assistant_bluetooth import BluetoothServiceInfo
+from sensor_state_data import SensorUpdate
+from victron_ble.devices.base import AdvertisementContainer, Device
+
+from .custom_state_data import SensorDeviceClass
+from .parser import (
+    _DEVICE_SENSORS,
+    VICTRON_IDENTIFIER,
+    VictronBluetoothDeviceData,
+    _decode_advertisement_key,
+    _decrypt,
+    _is_candidate,
+    _read_container,
+    _SensorField,
+    detect_device_type,
+)
+
+# Consecutive distinct advertisements that must decode consistently with a
+# candidate key before an address is bound to it
+CANDIDATE_CONFIRMATIONS = 2
+
+# Range, by device class, of the values a real device reports. The first
+# byte of a key only rules keys out, so a wrong candidate decrypts to
+# garbage that usually falls outside these.
+_PLAUSIBLE_RANGES: dict[str, tuple[float, float]] = {
+    SensorDeviceClass.VOLTAGE: (-1.0, 300.0),
+    SensorDeviceClass.CURRENT: (-2000.0, 2000.0),
+    SensorDeviceClass.TEMPERATURE: (-50.0, 100.0),
+    SensorDeviceClass.BATTERY: (0.0, 100.0),
+}
+
+# Largest change, by device class, between two advertisements of the same
+# device; garbage decoded with a wrong key jumps across the whole range
+_CONSISTENT_STEPS: dict[str, float] = {
+    SensorDeviceClass.VOLTAGE: 2.0,
+    SensorDeviceClass.TEMPERATURE: 5.0,
+}
+
+
+class _CandidateMatch(NamedTuple):
+    """The last plausible decode of an unbound address with a candidate key."""
+
+    raw_data: bytes
+    values: tuple[Any, ...]
+    confirmations: int
+
+
+class VictronBluetoothFleet:
+    """Hold the advertisement keys of many devices and parse their updates.
+
+    Each configured address gets its own VictronBluetoothDeviceData, created
+    the first time that device is heard, so devices that are configured but
+    out of range cost only their key. Incoming advertisements are routed by
+    a single dict lookup on their address. Addresses are stored and looked
+    up upper-case, so configured and reported addresses match in any case.
+
+    Devices whose address is not configured can still be decoded when their
+    key is among the candidate keys. Candidates are indexed by their first
+    byte, which every advertisement repeats in the clear, so each packet is
+    only tried against the few keys sharing its byte. Because that byte only
+    rules keys out, an address is bound to a candidate once
+    CANDIDATE_CONFIRMATIONS advertisements in a row decode to plausible
+    values that agree with each other, and unbound as soon as one does not
+    decode with it.
+    """
+
+    __slots__ = (
+        "_keys",
+        "_devices",
+        "_dedupe_cache_size",
+        "_candidate_keys",
+        "_discovered",
+        "_pending",
+    )
+
+    def __init__(
+        self,
+        advertisement_keys: Mapping[str, str] | None = None,
+        dedupe_cache_size: int = 0,
+        candidate_keys: Iterable[str] = (),
+    ) -> None:
+        """Initialize the fleet from an address to advertisement key mapping.
+
+        dedupe_cache_size is passed to each device parser. candidate_keys are
+        tried for addresses without a configured key. Raises ValueError if
+        any key is malformed.
+        """
+        self._keys: dict[str, str] = {}
+        self._devices: dict[str, VictronBluetoothDeviceData] = {}
+        self._dedupe_cache_size = dedupe_cache_size
+        self._candidate_keys: dict[int, list[str]] = {}
+        # Addresses bound to a candidate key rather than configured
+        self._discovered: set[str] = set()
+        # Candidate keys an unbound address has decoded plausibly with so far
+        self._pending: dict[str, dict[str, _CandidateMatch]] = {}
+        for address, advertisement_key in (advertisement_keys or {}).items():
+            self.set_advertisement_key(address, advertisement_key)
+        for advertisement_key in candidate_keys:
+            self.add_candidate_key(advertisement_key)
+
+    def __len__(self) -> int:
+        """Return the number of configured devices."""
+        return len(self._keys)
+
+    def __contains__(self, address: object) -> bool:
+        """Return True if a key is configured for the address."""
+        return isinstance(address, str) and address.upper() in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the configured addresses."""
+        return iter(self._keys)
+
+    def set_advertisement_key(
+        self, address: str, advertisement_key: str, rotation_window: float = 0.0
+    ) -> None:
+        """Configure or replace the advertisement key of a device.
+
+        When replacing a key, the previous key keeps being accepted for
+        rotation_window seconds; see
+        VictronBluetoothDeviceData.set_advertisement_key().
+        """
+        _decode_advertisement_key(advertisement_key)
+        address = address.upper()
+        self._keys[address] = advertisement_key
+        self._discovered.discard(address)
+        self._pending.pop(address, None)
+        device = self._devices.get(address)
+        if device is not None:
+            device.set_advertisement_key(advertisement_key, rotation_window)
+
+    def add_candidate_key(self, advertisement_key: str) -> None:
+        """Add a key to try for devices whose address is not configured."""
+        check_byte = _decode_advertisement_key(advertisement_key)[0]
+        keys = self._candidate_keys.setdefault(check_byte, [])
+        if advertisement_key not in keys:
+            keys.append(advertisement_key)
+
+    def remove_candidate_key(self, advertisement_key: str) -> None:
+        """Stop trying a candidate key; devices bound to it keep it."""
+        check_byte = _decode_advertisement_key(advertisement_key)[0]
+        keys = self._candidate_keys.get(check_byte, [])
+        if advertisement_key in keys:
+            keys.remove(advertisement_key)
+
+    def remove_device(self, address: str) -> None:
+        """Forget a device and its parser state."""
+        address = address.upper()
+        self._keys.pop(address, None)
+        self._devices.pop(address, None)
+        self._discovered.discard(address)
+        self._pending.pop(address, None)
+
+    def get_device(self, address: str) -> VictronBluetoothDeviceData | None:
+        """Return the parser of a device once it has been heard, else None."""
+        return self._devices.get(address.upper())
+
+    def update(self, data: BluetoothServiceInfo) -> SensorUpdate | None:
+        """Parse an advertisement, or return None if no key is known for it."""
+        address = data.address.upper()
+        if self._candidate_keys and (
+            address in self._discovered or address not in self._keys
+        ):
+            self._bind_candidate_key(address, data)
+        device = self._devices.get(address)
+        if device is None:
+            advertisement_key = self._keys.get(address)
+            if advertisement_key is None:
+                return None
+            device = self._devices[address] = VictronBluetoothDeviceData(
+                advertisement_key, dedupe_cache_size=self._dedupe_cache_size
+            )
+        return device.update(data)
+
+    def _bind_candidate_key(self, address: str, data: BluetoothServiceInfo) -> None:
+        """Bind an unconfigured address to the candidate key that decodes it.
+
+        An address already bound to a candidate is unbound when an
+        advertisement does not decode plausibly with its key.
+        """
+        raw_data = data.manufacturer_data.get(VICTRON_IDENTIFIER)
+        if raw_data is None or not _is_candidate(raw_data):
+            return
+        try:
+            parser = detect_device_type(raw_data)
+            container = _read_container(raw_data)
+        except struct_error:
+            return
+        if parser not in _DEVICE_SENSORS or not container.encrypted_data:
+            return
+        bound_key = self._keys.get(address)
+        if bound_key is not None:
+            if _candidate_values(parser, container, bound_key) is not None:
+                return
+            self.remove_device(address)
+
+        sensors = _DEVICE_SENSORS[parser]
+        previous = self._pending.pop(address, {})
+        matches: dict[str, _CandidateMatch] = {}
+        for advertisement_key in self._candidate_keys.get(
+            container.encrypted_data[0], ()
+        ):
+            match = previous.get(advertisement_key)
+            if match is not None and match.raw_data == raw_data:
+                # a repeat of the advertisement confirms nothing
+                matches[advertisement_key] = match
+                continue
+            values = _candidate_values(parser, container, advertisement_key)
+            if values is None:
+                continue
+            confirmations = 1
+            if match is not None and _consistent(sensors, match.values, values):
+                confirmations = match.confirmations + 1
+            if confirmations >= CANDIDATE_CONFIRMATIONS:
+                self._keys[address] = advertisement_key
+                self._discovered.add(address)
+                return
+            matches[advertisement_key] = _CandidateMatch(
+                bytes(raw_data), values, confirmations
+            )
+        if matches:
+            self._pending[address] = matches
+
+
+def _candidate_values(
+    parser: type[Device], container: AdvertisementContainer, advertisement_key: str
+) -> tuple[Any, ...] | None:
+    """Decode a container with a candidate key and return its sensor values.
+
+    Returns None when the payload does not decode, or decodes to values no
+    real device reports.
+    """
+    device = parser(advertisement_key)
+    sensors = _DEVICE_SENSORS[parser]
+    try:
+        data = device.data_type(
+            container.model_id,
+            device.parse_decrypted(
+                _decrypt(container, bytes.fromhex(advertisement_key))
+            ),
+        )
+        # victron-ble builds some enums in the getters, which raise ValueError
+        values = tuple(field.getter(data) for field in sensors)
+    except ValueError:
+        return None
+    for field, value in zip(sensors, values):
+        limits = _PLAUSIBLE_RANGES.get(field.description.device_class or "")
+        if (
+            limits is not None
+            and isinstance(value, (int, float))
+            and math.isfinite(value)
+            and not limits[0] <= value <= limits[1]
+        ):
+            return None
+    return values
+
+
+def _consistent(
+    sensors: tuple[_SensorField, ...],
+    previous: tuple[Any, ...],
+    values: tuple[Any, ...],
+) -> bool:
+    """Return True if no value moved further than a device could in between."""
+    for field, old, new in zip(sensors, previous, values):
+        step = _CONSISTENT_STEPS.get(field.description.device_class or "")
+        if (
+            step is not None
+            and isinstance(old, (int, float))
+            and isinstance(new, (int, float))
+            and abs(new - old) > step
+        ):
+            return False
+    return True
@@ -1,15 +1,28 @@
 """Data class for Victron BLE suitable for Home Assistant integration."""
 
 import logging
+import math
+import sys
+import time
 
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
 from enum import Enum
-from struct import error as struct_error
+from functools import cache, lru_cache
+from struct import Struct, error as struct_error
+from types import MappingProxyType
+from typing import Any, Callable, NamedTuple
 
 from bluetooth_sensor_state_data import BluetoothData
 
+from Crypto.Cipher import AES
+from Crypto.Util.Padding import pad
+from Crypto.Util.strxor import strxor
+
 from home_assistant_bluetooth import BluetoothServiceInfo
 
 from victron_ble.devices import (
+    MODEL_PARSER_OVERRIDE,
     AcCharger,
     AcChargerData,
     BatteryMonitor,
@@ -34,6 +47,22 @@ from victron_ble.devices import (
     VEBusData,
     detect_device_type,
 )
+from victron_ble.devices.base import (
+    ACInState,
+    AdvertisementContainer,
+    AlarmReason,
+    ChargerError,
+    Device,
+    DeviceData,
+    OffReason,
+    OperationMode,
+)
+from victron_ble.devices.battery_monitor import AuxMode
+from victron_ble.devices.dc_energy_meter import MeterType
+from victron_ble.devices.smart_battery_protect import OutputState
+from victron_ble.devices.smart_lithium import BalancerStatus
+
+from sensor_state_data import DeviceKey, SensorDescription, SensorUpdate, SensorValue
 
 from .custom_state_data import Keys, SensorDeviceClass, Units
 
@@ -41,58 +70,544 @@ _LOGGER = logging.getLogger(__name__)
 
 VICTRON_IDENTIFIER = 0x02E1
 
+# Manufacturer data that can be decoded in place: bytes, or a bytearray or
+# memoryview slice of a larger buffer such as a mapped capture file
+Buffer = bytes | bytearray | memoryview
+
+# Prefix, model id, readout type and IV ahead of the encrypted payload
+_HEADER = Struct("<HHBH")
+
+# Smallest change, per device class, that delta updates report
+DEFAULT_DEADBANDS: Mapping[str, float] = {
+    SensorDeviceClass.VOLTAGE: 0.01,
+    SensorDeviceClass.CURRENT: 0.05,
+}
+
+# Seconds during which repeats of a log message are counted instead of logged
+LOG_INTERVAL = 60.0
+
+# Longest gap, in seconds, between two samples that the net ampere-hour and
+# energy integrators bridge; a longer gap (the device was out of range) is
+# left out of the totals
+MAX_INTEGRATION_GAP = 60.0
+
+# Counters and cumulative stage timings reported by metrics(). Each update()
+# counts towards "packets" and exactly one outcome; the stages are device type
+# detection, key check, decryption and building the sensor entries.
+METRICS = (
+    "packets",
+    "not_victron",
+    "not_instant_readout",
+    "unsupported",
+    "no_key",
+    "key_mismatches",
+    "parse_failures",
+    "dedupe_hits",
+    "parsed",
+    "detect_ns",
+    "validate_ns",
+    "decrypt_ns",
+    "update_ns",
+)
+
+
+class _SensorField(NamedTuple):
+    """A sensor exposed for a victron-ble data class, built once per process."""
+
+    key: Keys
+    device_key: DeviceKey
+    name: str
+    description: SensorDescription
+    getter: Callable[[Any], Any]
+    enum_type: type[Enum] | None
+    # Lowercase member names reported for an enum sensor, see _enum_names()
+    enum_names: Mapping[Enum | None, str | None] | None
+
+
+class WindowStats(NamedTuple):
+    """Statistics of a numeric sensor over one aggregation window."""
+
+    min: float
+    max: float
+    mean: float
+    last: Any
+    samples: int
+
+
+class _Accumulator:
+    """Running statistics of one sensor within the current window."""
+
+    __slots__ = (
+        "name",
+        "description",
+        "samples",
+        "count",
+        "total",
+        "minimum",
+        "maximum",
+        "last",
+    )
+
+    def __init__(self, name: str | None, description: SensorDescription) -> None:
+        self.name = name
+        self.description = description
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the samples of the finished window."""
+        self.samples = 0
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+        self.last: Any = None
+
+    def add(self, value: Any) -> None:
+        """Fold one sample in; only numbers count towards the statistics."""
+        self.samples += 1
+        self.last = value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.count += 1
+            self.total += value
+            if value < self.minimum:
+                self.minimum = value
+            if value > self.maximum:
+                self.maximum = value
+
+
+class _DerivedSensors(NamedTuple):
+    """Sensors computed from the decoded sensor values of a device type."""
+
+    fields: tuple[_SensorField, ...]
+    # Maps the decoded values to one value per field, in a single pass
+    compute: Callable[[Mapping[DeviceKey, SensorValue]], tuple[Any, ...]]
+
+
+class _Integrator:
+    """Trapezoidal running integral of a sensor over time, in hours."""
+
+    __slots__ = ("total", "_time", "_value")
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self._time = 0.0
+        self._value: float | None = None
+
+    def add(self, now: float, value: float | None) -> float:
+        """Integrate up to a new sample and return the running total."""
+        previous = self._value
+        if (
+            previous is not None
+            and value is not None
+            and now - self._time <= MAX_INTEGRATION_GAP
+        ):
+            self.total += (previous + value) / 2 * (now - self._time) / 3600
+        self._time = now
+        self._value = value
+        return self.total
+
+
+@cache
+def _shared_device(parser: type[Device]) -> Device:
+    """Return one instance of a victron-ble parser, shared by every device.
+
+    The parsers only keep the advertisement key, which decoding a payload
+    that is already decrypted does not use.
+    """
+    return parser("00" * 16)
+
+
+class _DeltaFilter:
+    """The values last reported by delta updates and when all were reported."""
+
+    __slots__ = ("deadbands", "full_refresh_interval", "last_full_refresh", "reported")
+
+    def __init__(
+        self, deadbands: Mapping[str, float], full_refresh_interval: float
+    ) -> None:
+        self.deadbands = deadbands
+        self.full_refresh_interval = full_refresh_interval
+        self.last_full_refresh = float("-inf")
+        self.reported: dict[DeviceKey, Any] = {}
+
+
+class _Window:
+    """The open aggregation window and the statistics of the last one."""
+
+    __slots__ = ("length", "start", "accumulators", "statistics")
+
+    def __init__(self, length: float) -> None:
+        self.length = length
+        self.start: float | None = None
+        self.accumulators: dict[DeviceKey, _Accumulator] = {}
+        self.statistics: dict[str, WindowStats] = {}
+
+
+class VictronReading(tuple):
+    """Base of the compact readings returned by decode_reading().
+
+    Each device type has its own named tuple subclass, named after the device
+    type with a "Reading" suffix, with one field per sensor key. Enum sensors
+    hold the raw integer value; enum() converts one to its enum member.
+    """
+
+    __slots__ = ()
+    _enum_types: Mapping[str, type[Enum]] = {}
+
+    def enum(self, key: str) -> Enum | None:
+        """Return the enum member of an enum sensor, or None if it is unset."""
+        value = getattr(self, key)
+        return None if value is None else self._enum_types[key](value)
+
 
 class VictronBluetoothDeviceData(BluetoothData):
     """Class to hold Victron BLE device data."""
 
-    def __init__(self, advertisement_key: str | None = None) -> None:
-        """Initialize the Victron Bluetooth device data with an encryption key."""
+    def __init__(
+        self,
+        advertisement_key: str | None = None,
+        dedupe_cache_size: int = 0,
+        delta_updates: bool = False,
+        deadbands: Mapping[str, float] | None = None,
+        full_refresh_interval: float = 300.0,
+        enable_metrics: bool = False,
+        aggregation_window: float | None = None,
+        derived_metrics: bool = False,
+    ) -> None:
+        """Initialize the Victron Bluetooth device data with an encryption key.
+
+        Victron devices repeat the same encrypted payload several times before
+        their readings change. When dedupe_cache_size is positive, the sensor
+        entries built for up to that many distinct payloads are kept in an LRU
+        cache and replayed for repeats without decrypting them again. Because
+        the payload includes the nonce counter, a new counter is always a miss.
+
+        With delta_updates, an update only carries the sensors whose value
+        changed since it was last reported. Numeric sensors must move by more
+        than the deadband for their device class (DEFAULT_DEADBANDS unless
+        deadbands is given). Every full_refresh_interval seconds an update
+        carries every sensor again.
+
+        With enable_metrics, update() counts each advertisement by outcome and
+        accumulates the nanoseconds spent in each stage; see metrics().
+
+        With an aggregation_window in seconds, sensor values are accumulated
+        instead of reported, and the first update after each window carries
+        one value per sensor: the mean for numeric sensors and the last value
+        for enum sensors and running totals such as yield_today.
+        window_statistics() returns the min, max, mean, last value and number
+        of samples of the numeric sensors in the finished window.
+
+        With derived_metrics, updates also carry sensors computed from the
+        decoded values: power for battery monitors, DC energy meters and
+        Orion XS chargers, the lowest, highest and spread of the cell
+        voltages for Smart Lithium batteries, and the net ampere-hours and
+        energy that went through a battery monitor or DC energy meter since
+        the instance was created or reset_integrators() was called.
+
+        Raises ValueError if advertisement_key is not a 128-bit hex string.
+        """
         super().__init__()
+        # The state of each option is only created when it is enabled. Keeping
+        # under 30 instance attributes in all lets CPython store them in a
+        # compact array with keys shared between instances rather than a dict
+        # per instance, which matters for fleets of hundreds of devices.
+        self._dedupe_cache_size = dedupe_cache_size
+        self._dedupe_cache: (
+            OrderedDict[
+                bytes,
+                tuple[dict[DeviceKey, SensorValue], dict[DeviceKey, SensorDescription]],
+            ]
+            | None
+        ) = (
+            OrderedDict() if dedupe_cache_size > 0 else None
+        )
+        self._delta = (
+            _DeltaFilter(
+                DEFAULT_DEADBANDS if deadbands is None else dict(deadbands),
+                full_refresh_interval,
+            )
+            if delta_updates
+            else None
+        )
+        self._metrics: dict[str, int] | None = (
+            dict.fromkeys(METRICS, 0) if enable_metrics else None
+        )
+        self._window = (
+            _Window(aggregation_window) if aggregation_window is not None else None
+        )
+        # None unless derived_metrics is enabled
+        self._integrators: dict[DeviceKey, _Integrator] | None = (
+            {} if derived_metrics else None
+        )
+        # Per message: when it was last logged and how often it was suppressed
+        self._log_state: dict[str, list[float]] = {}
+        self._set_advertisement_key(advertisement_key)
+
+    def _log(self, level: int, msg: str, *args: Any) -> None:
+        """Log a packet-path message at most once per LOG_INTERVAL.
+
+        Repeats within the interval are only counted, and the count is
+        appended to the next message logged after the interval. Arguments
+        are formatted only when a record is emitted.
+        """
+        if not _LOGGER.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        state = self._log_state.get(msg)
+        if state is None:
+            self._log_state[msg] = [now, 0]
+        elif now - state[0] < LOG_INTERVAL:
+            state[1] += 1
+            return
+        else:
+            if state[1]:
+                msg += " (repeated %d times in the last %.0f seconds)"
+                args += (state[1], now - state[0])
+            state[0] = now
+            state[1] = 0
+        _LOGGER.log(level, msg, *args)
+
+    def _set_advertisement_key(self, advertisement_key: str | None) -> None:
+        """Decode and store the key, dropping any state tied to the old one."""
+        key = (
+            _decode_advertisement_key(advertisement_key) if advertisement_key else None
+        )
         self._advertisement_key: str | None = advertisement_key
+        self._key: bytes | None = key
+        self._previous_key: bytes | None = None
+        self._previous_key_expiry = 0.0
+        if self._dedupe_cache is not None:
+            self._dedupe_cache.clear()
 
-    def validate_advertisement_key(self, data: bytes) -> bool:
-        """Validate the advertisement key."""
-        if not self._advertisement_key:
-            _LOGGER.debug("Advertisement key not set")
+    def set_advertisement_key(
+        self, advertisement_key: str, rotation_window: float = 0.0
+    ) -> None:
+        """Replace the advertisement key, for example after it was rotated.
+
+        For rotation_window seconds, advertisements matching the previous key
+        are still decoded with it, until the first one matching the new key
+        shows the device has switched over. Raises ValueError if the key is
+        not a 128-bit hex string.
+        """
+        previous_key = self._key
+        self._set_advertisement_key(advertisement_key)
+        if previous_key is not None and previous_key != self._key:
+            self._previous_key = previous_key
+            self._previous_key_expiry = time.monotonic() + rotation_window
+
+    def metrics(self) -> dict[str, int]:
+        """Return a snapshot of the update counters and stage timings.
+
+        The keys are those of METRICS; the snapshot is empty unless the
+        parser was created with enable_metrics.
+        """
+        return dict(self._metrics) if self._metrics is not None else {}
+
+    def supported(self, data: BluetoothServiceInfo) -> bool:
+        """Return True if the advertisement comes from a supported device."""
+        raw_data = data.manufacturer_data.get(VICTRON_IDENTIFIER)
+        if raw_data is None or not _is_candidate(raw_data):
             return False
+        return super().supported(data)
+
+    def decode_reading(self, data: Buffer) -> VictronReading | None:
+        """Decode Victron manufacturer data into a compact reading.
 
+        This skips the per-sensor SensorValue and SensorDescription objects
+        that update() builds, for callers that only need the values. Values
+        are not rounded to the precision. Returns None when the data is not
+        an instant readout of a supported device that matches the key.
+
+        data may be a memoryview into a larger buffer; only the encrypted
+        payload is copied, to pad it for decryption.
+        """
+        if self._key is None or not _is_candidate(data):
+            return None
         try:
-            parser = detect_device_type(data)
+            # only slices and struct-unpacks data, so any buffer works
+            parser = detect_device_type(data)  # type: ignore [arg-type]
         except (struct_error, IndexError):
-            _LOGGER.error("Unable to detect device type from malformed data")
-            return False
-        if parser is None:
-            _LOGGER.error("Unable to detect device type")
+            return None
+        if parser not in _DEVICE_SENSORS:
+            return None
+        container = self._parse_container(data)
+        if container is None:
+            return None
+        key = self._matching_key(container)
+        if key is None:
+            return None
+        device = _shared_device(parser)
+        reading_type, getters = _reading_type(parser)
+        try:
+            parsed_data = device.data_type(
+                container.model_id, device.parse_decrypted(_decrypt(container, key))
+            )
+            # victron-ble builds some enums in the getters, which raise
+            # ValueError for codes it does not know
+            return reading_type(*[getter(parsed_data) for getter in getters])
+        except ValueError:
+            return None
+
+    def validate_advertisement_key(self, data: Buffer) -> bool:
+        """Validate the advertisement key."""
+        if self._key is None:
+            self._log(logging.DEBUG, "Advertisement key not set")
             return False
 
         try:
-            parsed_data = parser(self._advertisement_key).parse_container(data)
+            # only slices and struct-unpacks data, so any buffer works
+            parser = detect_device_type(data)  # type: ignore [arg-type]
         except (struct_error, IndexError):
-            _LOGGER.error("Unable to parse container from malformed data")
+            self._log(logging.ERROR, "Unable to detect device type from malformed data")
             return False
-        if parsed_data is None:
-            _LOGGER.error("Unable to parse data")
+        if parser is None:
+            self._log(logging.ERROR, "Unable to detect device type")
             return False
 
-        encrypted_data = parsed_data.encrypted_data
-        if not encrypted_data:
-            _LOGGER.error("No encrypted data in advertisement")
+        container = self._parse_container(data)
+        if container is None:
             return False
+        return self._matching_key(container) is not None
 
+    def _parse_container(self, data: Buffer) -> AdvertisementContainer | None:
+        """Split an advertisement into its header fields and encrypted payload."""
         try:
-            key_first_byte = bytes.fromhex(self._advertisement_key)[0]
-        except (ValueError, IndexError):
-            _LOGGER.error("Invalid advertisement key")
-            return False
+            return _read_container(data)
+        except struct_error:
+            self._log(logging.ERROR, "Unable to parse container from malformed data")
+            return None
 
-        if encrypted_data[0] != key_first_byte:
-            # only possible check is whether the first byte matches
-            _LOGGER.error("Advertisement key does not match")
-            return False
+    def _matching_key(self, container: AdvertisementContainer) -> bytes | None:
+        """Return the key whose check byte matches the container, if any."""
+        encrypted_data = container.encrypted_data
+        if not encrypted_data:
+            self._log(logging.ERROR, "No encrypted data in advertisement")
+            return None
 
-        return True
+        # only possible check is whether the first byte matches
+        check_byte = encrypted_data[0]
+        key = self._key
+        if key is not None and check_byte == key[0]:
+            self._previous_key = None
+            return key
+        previous_key = self._previous_key
+        if (
+            previous_key is not None
+            and check_byte == previous_key[0]
+            and time.monotonic() < self._previous_key_expiry
+        ):
+            return previous_key
+        self._log(logging.ERROR, "Advertisement key does not match")
+        return None
 
     def _start_update(self, data: BluetoothServiceInfo) -> None:
+        self._update_from_advertisement(data, None)
+
+    def update(self, data: BluetoothServiceInfo) -> SensorUpdate:
+        """Update from an advertisement and return the sensor update.
+
+        supported() decodes the advertisement too, so the stateful steps
+        (metrics, net totals, window aggregation and delta filtering) run
+        here rather than in _start_update(), leaving supported() without
+        side effects.
+        """
+        self._events_updates.clear()
+        metrics = self._metrics
+        if metrics is None:
+            self._update_from_advertisement(data, None)
+        else:
+            metrics["packets"] += 1
+            metrics[self._update_from_advertisement(data, metrics)] += 1
+        if self._sensor_values_updates:
+            if self._integrators is not None:
+                self._integrate(self._integrators)
+            if self._window is not None:
+                self._aggregate(self._window)
+            if self._delta is not None and self._sensor_values_updates:
+                self._drop_unchanged(self._delta)
+        self.update_signal_strength(data.rssi)
+        return self._finish_update()
+
+    def reset_integrators(self) -> None:
+        """Restart the net ampere-hour and energy totals from zero."""
+        if self._integrators is not None:
+            self._integrators.clear()
+
+    def _integrate(self, integrators: dict[DeviceKey, _Integrator]) -> None:
+        """Advance the integrators of the sensors this update carries."""
+        values = self._sensor_values_updates
+        now = time.monotonic()
+        for field, source in _INTEGRALS:
+            value = values.get(source)
+            if value is None:
+                continue
+            integrator = integrators.get(field.device_key)
+            if integrator is None:
+                integrator = integrators[field.device_key] = _Integrator()
+            self._set_value(field, integrator.add(now, _number(value)))
+
+    def window_statistics(self) -> dict[str, WindowStats]:
+        """Return the numeric sensor statistics of the last finished window."""
+        return dict(self._window.statistics) if self._window is not None else {}
+
+    def _aggregate(self, window: _Window) -> None:
+        """Fold this update into the window, reporting it once the window ends."""
+        values = self._sensor_values_updates
+        descriptions = self._sensor_descriptions_updates
+        accumulators = window.accumulators
+        for device_key, value in values.items():
+            accumulator = accumulators.get(device_key)
+            if accumulator is None:
+                accumulator = accumulators[device_key] = _Accumulator(
+                    value.name, descriptions[device_key]
+                )
+            accumulator.add(value.native_value)
+        values.clear()
+        descriptions.clear()
+
+        now = time.monotonic()
+        if window.start is None:
+            window.start = now
+        if now - window.start < window.length:
+            return
+        window.start = now
+
+        precision = self.precision
+        statistics = window.statistics
+        statistics.clear()
+        for device_key, accumulator in accumulators.items():
+            if not accumulator.samples:
+                continue
+            native_value = accumulator.last
+            if accumulator.count:
+                mean = accumulator.total / accumulator.count
+                if precision >= 0:
+                    mean = round(mean, precision)
+                statistics[device_key.key] = WindowStats(
+                    accumulator.minimum,
+                    accumulator.maximum,
+                    mean,
+                    accumulator.last,
+                    accumulator.count,
+                )
+                if device_key not in _CUMULATIVE_SENSORS:
+                    native_value = mean
+            values[device_key] = SensorValue(
+                device_key=device_key,
+                name=accumulator.name,
+                native_value=native_value,
+            )
+            descriptions[device_key] = accumulator.description
+            accumulator.reset()
+
+    def _update_from_advertisement(
+        self, data: BluetoothServiceInfo, metrics: dict[str, int] | None
+    ) -> str:
+        """Build the sensor entries for an advertisement and return its outcome.
+
+        When metrics is given, the time spent in each stage is added to it.
+        """
         # Clear per-update state to prevent stale data from a previous
         # successful parse leaking into the current SensorUpdate when
         # this update returns early (e.g. unsupported device, bad key).
@@ -101,529 +616,720 @@ class VictronBluetoothDeviceData(BluetoothData):
         self._binary_sensor_values_updates.clear()
         self._binary_sensor_descriptions_updates.clear()
 
-        try:
-            raw_data = data.manufacturer_data[VICTRON_IDENTIFIER]
-        except (KeyError, IndexError):
+        raw_data = data.manufacturer_data.get(VICTRON_IDENTIFIER)
+        if raw_data is None:
             # not a Victron device
-            return
+            return "not_victron"
 
         if not raw_data.startswith(b"\x10"):
             # not an instant-update advertisement
-            return
+            return "not_instant_readout"
+
+        if not _is_candidate(raw_data):
+            self._log(
+                logging.DEBUG,
+                "Ignoring unsupported advertisement %s",
+                _LazyHex(raw_data),
+            )
+            return "unsupported"
 
+        start = time.perf_counter_ns() if metrics is not None else 0
         try:
             parser = detect_device_type(raw_data)
         except struct_error:
             parser = None
+        if metrics is not None:
+            start = _add_elapsed(metrics, "detect_ns", start)
 
         if parser is None:
-            _LOGGER.debug("Ignoring unsupported advertisement %s", raw_data.hex())
-            return
-        if not issubclass(
-            parser,
-            (
-                AcCharger,
-                BatteryMonitor,
-                BatterySense,
-                DcDcConverter,
-                DcEnergyMeter,
-                Inverter,
-                OrionXS,
-                SmartBatteryProtect,
-                SmartLithium,
-                SolarCharger,
-                VEBus,
-            ),
-        ):
-            _LOGGER.debug("Unsupported device type")
-            return
+            self._log(
+                logging.DEBUG,
+                "Ignoring unsupported advertisement %s",
+                _LazyHex(raw_data),
+            )
+            return "unsupported"
+        sensors = _DEVICE_SENSORS.get(parser)
+        if sensors is None:
+            self._log(logging.DEBUG, "Unsupported device type")
+            return "unsupported"
         self.set_device_manufacturer(data.manufacturer or "Victron")
         self.set_device_name(data.name)
         self.set_device_type(parser.__name__)
-        if not self.validate_advertisement_key(raw_data):
-            return
-        assert self._advertisement_key is not None
+        if self._key is None:
+            self._log(logging.DEBUG, "Advertisement key not set")
+            return "no_key"
+
+        dedupe_cache = self._dedupe_cache
+        if dedupe_cache is not None:
+            cached = dedupe_cache.get(raw_data)
+            if cached is not None:
+                dedupe_cache.move_to_end(raw_data)
+                self._sensor_values_updates.update(cached[0])
+                self._sensor_descriptions_updates.update(cached[1])
+                return "dedupe_hits"
+
+        # Detect, split, check and decrypt exactly once per advertisement;
+        # victron-ble's Device.parse() would re-parse the container for each
+        # of these steps.
+        device = _shared_device(parser)
+        container = self._parse_container(raw_data)
+        if container is None:
+            return "parse_failures"
+        key = self._matching_key(container)
+        if metrics is not None:
+            start = _add_elapsed(metrics, "validate_ns", start)
+        if key is None:
+            return "key_mismatches"
 
         try:
-            parsed_data = parser(self._advertisement_key).parse(raw_data)
+            parsed_data = device.data_type(
+                container.model_id, device.parse_decrypted(_decrypt(container, key))
+            )
         except ValueError:
             parsed_data = None
+        if metrics is not None:
+            start = _add_elapsed(metrics, "decrypt_ns", start)
+        if parsed_data is not None:
+            try:
+                self._update_sensors(parsed_data, sensors)
+            except ValueError:
+                # an enum getter met a code victron-ble does not know
+                self._sensor_values_updates.clear()
+                self._sensor_descriptions_updates.clear()
+                parsed_data = None
         if parsed_data is None:
-            _LOGGER.debug("Unable to parse data")
+            self._log(logging.DEBUG, "Unable to parse data")
+            return "parse_failures"
+        if self._integrators is not None:
+            derived = _DERIVED_SENSORS.get(device.data_type)
+            if derived is not None:
+                for field, native_value in zip(
+                    derived.fields, derived.compute(self._sensor_values_updates)
+                ):
+                    self._set_value(field, native_value)
+
+        if dedupe_cache is not None:
+            dedupe_cache[raw_data] = (
+                dict(self._sensor_values_updates),
+                dict(self._sensor_descriptions_updates),
+            )
+            if len(dedupe_cache) > self._dedupe_cache_size:
+                dedupe_cache.popitem(last=False)
+        if metrics is not None:
+            _add_elapsed(metrics, "update_ns", start)
+        return "parsed"
+
+    def _drop_unchanged(self, delta: _DeltaFilter) -> None:
+        """Remove sensors whose value has not changed since it was reported."""
+        values = self._sensor_values_updates
+        reported = delta.reported
+        now = time.monotonic()
+        if now - delta.last_full_refresh >= delta.full_refresh_interval:
+            delta.last_full_refresh = now
+            for device_key, value in values.items():
+                reported[device_key] = value.native_value
             return
-        if isinstance(parsed_data, AcChargerData):
-            self._update_ac_charger(parsed_data)
-        elif isinstance(parsed_data, BatteryMonitorData):
-            self._update_battery_monitor(parsed_data)
-        elif isinstance(parsed_data, BatterySenseData):
-            self._update_battery_sense(parsed_data)
-        elif isinstance(parsed_data, DcDcConverterData):
-            self._update_dc_dc_converter(parsed_data)
-        elif isinstance(parsed_data, DcEnergyMeterData):
-            self._update_dc_energy_meter(parsed_data)
-        elif isinstance(parsed_data, InverterData):
-            self._update_inverter(parsed_data)
-        elif isinstance(parsed_data, OrionXSData):
-            self._update_orion_xs(parsed_data)
-        elif isinstance(parsed_data, SolarChargerData):
-            self._update_solar_charger(parsed_data)
-        elif isinstance(parsed_data, SmartBatteryProtectData):
-            self._update_smart_battery_protect(parsed_data)
-        elif isinstance(parsed_data, SmartLithiumData):
-            self._update_smart_lithium(parsed_data)
-        elif isinstance(parsed_data, VEBusData):
-            self._update_vebus(parsed_data)
-
-    def _update_ac_charger(self, data: AcChargerData) -> None:
-        self.update_sensor(
-            Keys.CHARGE_STATE,
-            None,
-            _enum_to_lowercase(data.get_charge_state()),
-        )
-        self.update_sensor(
-            Keys.CHARGER_ERROR,
-            None,
-            _enum_to_lowercase(data.get_charger_error()),
-        )
-        self.update_sensor(
-            Keys.OUTPUT_VOLTAGE_1,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_output_voltage1(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OUTPUT_CURRENT_1,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_output_current1(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OUTPUT_VOLTAGE_2,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_output_voltage2(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OUTPUT_CURRENT_2,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_output_current2(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OUTPUT_VOLTAGE_3,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_output_voltage3(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OUTPUT_CURRENT_3,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_output_current3(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.TEMPERATURE,
-            Units.TEMP_CELSIUS,  # type: ignore [arg-type]
-            data.get_temperature(),
-            SensorDeviceClass.TEMPERATURE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.AC_CURRENT,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_ac_current(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
 
-    def _update_battery_monitor(self, data: BatteryMonitorData) -> None:
-        self.update_sensor(
-            Keys.REMAINING_MINUTES,
-            Units.TIME_MINUTES,  # type: ignore [arg-type]
-            data.get_remaining_mins(),
-            SensorDeviceClass.DURATION,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.CURRENT,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_current(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.STATE_OF_CHARGE,
-            Units.PERCENTAGE,  # type: ignore [arg-type]
-            data.get_soc(),
-            SensorDeviceClass.BATTERY,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.CONSUMED_AMPERE_HOURS,
-            Units.ELECTRIC_CURRENT_FLOW_AMPERE_HOUR,  # type: ignore [arg-type]
-            data.get_consumed_ah(),
-            SensorDeviceClass.CURRENT_FLOW,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.ALARM,
-            None,
-            _enum_to_lowercase(data.get_alarm()),
-        )
-        self.update_sensor(
-            Keys.AUX_MODE,
-            None,
-            _enum_to_lowercase(data.get_aux_mode()),
-        )
-        self.update_sensor(
-            Keys.TEMPERATURE,
-            Units.TEMP_CELSIUS,  # type: ignore [arg-type]
-            data.get_temperature(),
-            SensorDeviceClass.TEMPERATURE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.STARTER_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_starter_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.MIDPOINT_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_midpoint_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
+        descriptions = self._sensor_descriptions_updates
+        for device_key, value in list(values.items()):
+            native_value = value.native_value
+            if device_key in reported:
+                last_value = reported[device_key]
+                if native_value == last_value:
+                    unchanged = True
+                elif isinstance(native_value, (int, float)) and isinstance(
+                    last_value, (int, float)
+                ):
+                    device_class = descriptions[device_key].device_class
+                    deadband = delta.deadbands.get(device_class or "", 0.0)
+                    unchanged = abs(native_value - last_value) <= deadband
+                else:
+                    unchanged = False
+                if unchanged:
+                    del values[device_key]
+                    del descriptions[device_key]
+                    continue
+            reported[device_key] = native_value
 
-    def _update_battery_sense(self, data: BatterySenseData) -> None:
-        self.update_sensor(
-            Keys.VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.TEMPERATURE,
-            Units.TEMP_CELSIUS,  # type: ignore [arg-type]
-            data.get_temperature(),
-            SensorDeviceClass.TEMPERATURE,  # type: ignore [arg-type]
-        )
+    def _update_sensors(
+        self, data: DeviceData, sensors: tuple[_SensorField, ...]
+    ) -> None:
+        """Write one sensor entry per precomputed field of the device data."""
+        values = self._sensor_values_updates
+        descriptions = self._sensor_descriptions_updates
+        precision = self.precision
+        for field in sensors:
+            native_value = field.getter(data)
+            if field.enum_names is not None:
+                native_value = field.enum_names.get(native_value)
+            elif precision >= 0 and isinstance(native_value, float):
+                native_value = round(native_value, precision)
+            values[field.device_key] = SensorValue(
+                device_key=field.device_key,
+                name=field.name,
+                native_value=native_value,
+            )
+            descriptions[field.device_key] = field.description
 
-    def _update_dc_dc_converter(self, data: DcDcConverterData) -> None:
-        self.update_sensor(
-            Keys.CHARGE_STATE,
-            None,
-            _enum_to_lowercase(data.get_charge_state()),
-        )
-        self.update_sensor(
-            Keys.CHARGER_ERROR,
-            None,
-            _enum_to_lowercase(data.get_charger_error()),
-        )
-        self.update_sensor(
-            Keys.INPUT_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_input_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OFF_REASON,
-            None,
-            _enum_to_lowercase(data.get_off_reason()),
-        )
-        self.update_sensor(
-            Keys.OUTPUT_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_output_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
+    def _set_value(self, field: _SensorField, native_value: Any) -> None:
+        """Write the entry of a sensor computed outside of the device data."""
+        if self.precision >= 0 and isinstance(native_value, float):
+            native_value = round(native_value, self.precision)
+        self._sensor_values_updates[field.device_key] = SensorValue(
+            device_key=field.device_key,
+            name=field.name,
+            native_value=native_value,
+        )
+        self._sensor_descriptions_updates[field.device_key] = field.description
 
-    def _update_dc_energy_meter(self, data: DcEnergyMeterData) -> None:
-        self.update_sensor(
-            Keys.METER_TYPE,
-            None,
-            _enum_to_lowercase(data.get_meter_type()),
-        )
-        self.update_sensor(
-            Keys.CURRENT,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_current(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.ALARM,
-            None,
-            _enum_to_lowercase(data.get_alarm()),
-        )
-        self.update_sensor(
-            Keys.TEMPERATURE,
-            Units.TEMP_CELSIUS,  # type: ignore [arg-type]
-            data.get_temperature(),
-            SensorDeviceClass.TEMPERATURE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.AUX_MODE,
-            None,
-            _enum_to_lowercase(data.get_aux_mode()),
-        )
-        self.update_sensor(
-            Keys.TEMPERATURE,
-            Units.TEMP_CELSIUS,  # type: ignore [arg-type]
-            data.get_temperature(),
-            SensorDeviceClass.TEMPERATURE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.STARTER_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_starter_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
 
-    def _update_smart_battery_protect(self, data: SmartBatteryProtectData) -> None:
-        self.update_sensor(
-            Keys.DEVICE_STATE,
-            None,
-            _enum_to_lowercase(data.get_device_state()),
-        )
-        self.update_sensor(
-            Keys.OUTPUT_STATE,
-            None,
-            _enum_to_lowercase(data.get_output_state()),
-        )
-        self.update_sensor(
-            Keys.ERROR_CODE,
-            None,
-            _enum_to_lowercase(data.get_error_code()),
-        )
-        self.update_sensor(
-            Keys.ALARM,
-            None,
-            _enum_to_lowercase(data.get_alarm_reason()),
-        )
-        self.update_sensor(
-            Keys.WARNING,
-            None,
-            _enum_to_lowercase(data.get_warning_reason()),
-        )
-        self.update_sensor(
-            Keys.OFF_REASON,
-            None,
-            _enum_to_lowercase(data.get_off_reason()),
-        )
-        self.update_sensor(
-            Keys.INPUT_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_input_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OUTPUT_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_output_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
+class _LazyHex:
+    """Render bytes as hex only when a log record is formatted."""
 
-    def _update_inverter(self, data: InverterData) -> None:
-        self.update_sensor(
-            Keys.DEVICE_STATE,
-            None,
-            _enum_to_lowercase(data.get_device_state()),
-        )
-        self.update_sensor(
-            Keys.ALARM,
-            None,
-            _enum_to_lowercase(data.get_alarm()),
-        )
-        self.update_sensor(
-            Keys.BATTERY_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_battery_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.AC_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_ac_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.AC_CURRENT,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_ac_current(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.AC_APPARENT_POWER,
-            Units.POWER_VOLT_AMPERE,  # type: ignore [arg-type]
-            data.get_ac_apparent_power(),
-            SensorDeviceClass.APPARENT_POWER,  # type: ignore [arg-type]
-        )
+    __slots__ = ("_data",)
 
-    def _update_orion_xs(self, data: OrionXSData) -> None:
-        self.update_sensor(
-            Keys.CHARGE_STATE,
-            None,
-            _enum_to_lowercase(data.get_charge_state()),
-        )
-        self.update_sensor(
-            Keys.CHARGER_ERROR,
-            None,
-            _enum_to_lowercase(data.get_charger_error()),
-        )
-        self.update_sensor(
-            Keys.INPUT_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_input_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.INPUT_CURRENT,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_input_current(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OUTPUT_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_output_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OUTPUT_CURRENT,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_output_current(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.OFF_REASON,
-            None,
-            _enum_to_lowercase(data.get_off_reason()),
-        )
+    def __init__(self, data: bytes) -> None:
+        self._data = data
 
-    def _update_smart_lithium(self, data: SmartLithiumData) -> None:
-        self.update_sensor(
-            Keys.BATTERY_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_battery_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.BATTERY_TEMPERATURE,
-            Units.TEMP_CELSIUS,  # type: ignore [arg-type]
-            data.get_battery_temperature(),
-            SensorDeviceClass.TEMPERATURE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.BALANCER_STATUS,
-            None,
-            _enum_to_lowercase(data.get_balancer_status()),
-        )
-        for i in range(8):
-            self.update_sensor(
-                getattr(Keys, f"CELL_{i+1}_VOLTAGE"),
-                Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-                data.get_cell_voltages()[i],
-                SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
+    def __str__(self) -> str:
+        return self._data.hex()
+
+
+def _add_elapsed(metrics: dict[str, int], stage: str, start: int) -> int:
+    """Add the time since start to a stage timing and return the new start."""
+    now = time.perf_counter_ns()
+    metrics[stage] += now - start
+    return now
+
+
+def _sensor(
+    key: Keys,
+    getter: Callable[[Any], Any],
+    unit: Units | None = None,
+    device_class: SensorDeviceClass | None = None,
+    enum_type: type[Enum] | None = None,
+) -> _SensorField:
+    """Describe a sensor whose value is returned by getter."""
+    device_key = DeviceKey(key, None)
+    return _SensorField(
+        key=key,
+        device_key=device_key,
+        name=key.replace("_", " ").title(),
+        description=SensorDescription(
+            device_key=device_key,
+            device_class=device_class,  # type: ignore [arg-type]
+            native_unit_of_measurement=unit,  # type: ignore [arg-type]
+        ),
+        getter=getter,
+        enum_type=enum_type,
+        enum_names=_enum_names(enum_type) if enum_type is not None else None,
+    )
+
+
+def _enum_sensor(
+    key: Keys, getter: Callable[[Any], Enum | None], enum_type: type[Enum]
+) -> _SensorField:
+    """Describe a sensor reporting an enum as its lowercase member name."""
+    return _sensor(key, getter, enum_type=enum_type)
+
+
+def _voltage_sensor(key: Keys, getter: Callable[[Any], Any]) -> _SensorField:
+    return _sensor(
+        key, getter, Units.ELECTRIC_POTENTIAL_VOLT, SensorDeviceClass.VOLTAGE
+    )
+
+
+def _current_sensor(key: Keys, getter: Callable[[Any], Any]) -> _SensorField:
+    return _sensor(
+        key, getter, Units.ELECTRIC_CURRENT_AMPERE, SensorDeviceClass.CURRENT
+    )
+
+
+def _temperature_sensor(key: Keys, getter: Callable[[Any], Any]) -> _SensorField:
+    return _sensor(key, getter, Units.TEMP_CELSIUS, SensorDeviceClass.TEMPERATURE)
+
+
+def _power_sensor(key: Keys, getter: Callable[[Any], Any]) -> _SensorField:
+    return _sensor(key, getter, Units.POWER_WATT, SensorDeviceClass.POWER)
+
+
+def _cell_voltage_getter(index: int) -> Callable[[SmartLithiumData], Any]:
+    return lambda data: data.get_cell_voltages()[index]
+
+
+def _computed(data: Any) -> Any:
+    """Stand in for the getter of a sensor computed from other sensors."""
+    raise TypeError("Derived sensors are computed from the decoded values")
+
+
+def _number(value: SensorValue) -> float | None:
+    """Return the native value of a numeric sensor, or None if it is unset."""
+    native_value = value.native_value
+    return native_value if isinstance(native_value, (int, float)) else None
+
+
+def _power_compute(
+    decimals: int, *pairs: tuple[Keys, Keys]
+) -> Callable[[Mapping[DeviceKey, SensorValue]], tuple[Any, ...]]:
+    """Multiply each (voltage, current) pair of decoded values.
+
+    decimals is the sum of the decimals victron-ble decodes the voltage and
+    current with, so rounding to it only drops floating point noise.
+    """
+    device_keys = [
+        (DeviceKey(voltage, None), DeviceKey(current, None))
+        for voltage, current in pairs
+    ]
+
+    def compute(values: Mapping[DeviceKey, SensorValue]) -> tuple[Any, ...]:
+        powers = []
+        for voltage_key, current_key in device_keys:
+            voltage = _number(values[voltage_key])
+            current = _number(values[current_key])
+            powers.append(
+                None
+                if voltage is None or current is None
+                else round(voltage * current, decimals)
             )
+        return tuple(powers)
 
-    def _update_solar_charger(self, data: SolarChargerData) -> None:
-        self.update_sensor(
-            Keys.CHARGE_STATE,
-            None,
-            _enum_to_lowercase(data.get_charge_state()),
-        )
-        self.update_sensor(
-            Keys.CHARGER_ERROR,
-            None,
-            _enum_to_lowercase(data.get_charger_error()),
-        )
-        self.update_sensor(
-            Keys.BATTERY_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_battery_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.BATTERY_CURRENT,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_battery_charging_current(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.YIELD_TODAY,
-            Units.ENERGY_WATT_HOUR,  # type: ignore [arg-type]
-            data.get_yield_today(),
-            SensorDeviceClass.ENERGY,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.SOLAR_POWER,
-            Units.POWER_WATT,  # type: ignore [arg-type]
-            data.get_solar_power(),
-            SensorDeviceClass.POWER,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.EXTERNAL_DEVICE_LOAD,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_external_device_load(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
+    return compute
 
-    def _update_vebus(self, data: VEBusData) -> None:
-        self.update_sensor(
-            Keys.DEVICE_STATE,
-            None,
-            _enum_to_lowercase(data.get_device_state()),
-        )
-        self.update_sensor(
-            Keys.AC_IN_STATE,
-            None,
-            _enum_to_lowercase(data.get_ac_in_state()),
-        )
-        self.update_sensor(
-            Keys.AC_IN_POWER,
-            Units.POWER_WATT,  # type: ignore [arg-type]
-            data.get_ac_in_power(),
-            SensorDeviceClass.POWER,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.AC_OUT_POWER,
-            Units.POWER_WATT,  # type: ignore [arg-type]
-            data.get_ac_out_power(),
-            SensorDeviceClass.POWER,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.BATTERY_CURRENT,
-            Units.ELECTRIC_CURRENT_AMPERE,  # type: ignore [arg-type]
-            data.get_battery_current(),
-            SensorDeviceClass.CURRENT,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.BATTERY_VOLTAGE,
-            Units.ELECTRIC_POTENTIAL_VOLT,  # type: ignore [arg-type]
-            data.get_battery_voltage(),
-            SensorDeviceClass.VOLTAGE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.BATTERY_TEMPERATURE,
-            Units.TEMP_CELSIUS,  # type: ignore [arg-type]
-            data.get_battery_temperature(),
-            SensorDeviceClass.TEMPERATURE,  # type: ignore [arg-type]
-        )
-        self.update_sensor(
-            Keys.STATE_OF_CHARGE,
-            Units.PERCENTAGE,  # type: ignore [arg-type]
-            data.get_soc(),
-            SensorDeviceClass.BATTERY,  # type: ignore [arg-type]
-        )
+
+def _cell_statistics(values: Mapping[DeviceKey, SensorValue]) -> tuple[Any, ...]:
+    """Return the lowest, highest and spread of the decoded cell voltages."""
+    lowest: float | None = None
+    highest: float | None = None
+    for device_key in _CELL_VOLTAGE_KEYS:
+        voltage = _number(values[device_key])
+        if voltage is None:
+            continue
+        if lowest is None or voltage < lowest:
+            lowest = voltage
+        if highest is None or voltage > highest:
+            highest = voltage
+    if lowest is None or highest is None:
+        return None, None, None
+    delta = highest - lowest
+    # Cells out of the measurable range decode as -inf or +inf
+    if not math.isfinite(delta):
+        return lowest, highest, None
+    return lowest, highest, round(delta, _CELL_VOLTAGE_DECIMALS)
+
+
+def _enum_value_getter(getter: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Wrap an enum getter to return the raw value of the member."""
+
+    def get_value(data: Any) -> Any:
+        member = getter(data)
+        return None if member is None else member.value
+
+    return get_value
+
+
+@cache
+def _reading_type(
+    parser: type[Device],
+) -> tuple[type[VictronReading], tuple[Callable[[Any], Any], ...]]:
+    """Build the reading class of a device type and a getter per field.
+
+    Built on first use, since creating the named tuple classes of every
+    device type up front would add to the import time.
+    """
+    sensors = _DEVICE_SENSORS[parser]
+    name = f"{parser.__name__}Reading"
+    fields = namedtuple(  # type: ignore [misc]
+        name, [str(field.key) for field in sensors]
+    )
+    reading_type = type(
+        name,
+        (fields, VictronReading),
+        {
+            "__slots__": (),
+            "__doc__": f"Sensor values decoded from a {parser.__name__}.",
+            "_enum_types": {
+                str(field.key): field.enum_type
+                for field in sensors
+                if field.enum_type is not None
+            },
+        },
+    )
+    getters = tuple(
+        field.getter if field.enum_type is None else _enum_value_getter(field.getter)
+        for field in sensors
+    )
+    return reading_type, getters
+
+
+def _decode_advertisement_key(advertisement_key: str) -> bytes:
+    """Decode a hex advertisement key, raising ValueError if it is malformed."""
+    try:
+        key = bytes.fromhex(advertisement_key)
+    except ValueError:
+        key = b""
+    if len(key) != 16:
+        raise ValueError(
+            "Invalid advertisement key: expected 32 hexadecimal characters"
+        )
+    return key
+
+
+def _is_candidate(data: Buffer) -> bool:
+    """Cheaply tell whether data may be an instant readout of a supported device.
+
+    Only the prefix, model id and readout type bytes are inspected, so
+    foreign and unsupported advertisements are rejected before detection,
+    decryption or any per-update bookkeeping.
+    """
+    if len(data) <= _HEADER.size or data[0] != 0x10:
+        return False
+    supported = _SUPPORTED_MODEL_OVERRIDES.get(data[2] | data[3] << 8)
+    if supported is not None:
+        return supported
+    return data[4] in _SUPPORTED_READOUT_TYPES
+
+
+def _read_container(data: Buffer) -> AdvertisementContainer:
+    """Unpack the header in place, like victron-ble's Device.parse_container().
+
+    The encrypted payload is a slice of data, so it is a view rather than a
+    copy when data is a memoryview. Raises struct.error if data is too short.
+    """
+    prefix, model_id, readout_type, iv = _HEADER.unpack_from(data)
+    return AdvertisementContainer(
+        prefix=prefix,
+        model_id=model_id,
+        readout_type=readout_type,
+        iv=iv,
+        encrypted_data=data[_HEADER.size :],  # type: ignore [arg-type]
+    )
+
+
+@lru_cache(maxsize=1024)
+def _cipher(key: bytes) -> Any:
+    """Return an AES block cipher for the key, expanding its key schedule once."""
+    return AES.new(key, AES.MODE_ECB)
+
+
+def _padded_payload(container: AdvertisementContainer) -> bytes:
+    """Return the encrypted payload padded to whole AES blocks."""
+    # The first encrypted byte is the key check byte, not part of the payload;
+    # padding needs bytes, which is a no-op conversion for bytes input
+    return pad(bytes(container.encrypted_data[1:]), 16)
+
+
+def _counter_blocks(iv: int, blocks: int) -> bytes:
+    """Return the AES-CTR counter blocks of a payload of the given length.
+
+    The counter is the IV as a 128-bit little-endian integer, incremented
+    once per block.
+    """
+    return b"".join((iv + block).to_bytes(16, "little") for block in range(blocks))
+
+
+def _decrypt(container: AdvertisementContainer, key: bytes) -> bytes:
+    """Decrypt the payload of an advertisement container with the given key.
+
+    This is victron-ble's AES-CTR decryption, with the keystream computed by
+    a block cipher reused across advertisements with the same key.
+    """
+    payload = _padded_payload(container)
+    keystream = _cipher(key).encrypt(_counter_blocks(container.iv, len(payload) // 16))
+    return strxor(payload, keystream)
+
+
+def _decrypt_many(containers: list[AdvertisementContainer], key: bytes) -> list[bytes]:
+    """Decrypt the payloads of many containers sharing a key, like _decrypt().
+
+    The keystream of every payload comes from a single block cipher call and
+    is applied with a single XOR.
+    """
+    payloads = [_padded_payload(container) for container in containers]
+    keystream = _cipher(key).encrypt(
+        b"".join(
+            _counter_blocks(container.iv, len(payload) // 16)
+            for container, payload in zip(containers, payloads)
+        )
+    )
+    decrypted = strxor(b"".join(payloads), keystream)
+    results = []
+    offset = 0
+    for payload in payloads:
+        results.append(decrypted[offset : offset + len(payload)])
+        offset += len(payload)
+    return results
+
+
+@cache
+def _enum_names(enum_type: type[Enum]) -> Mapping[Enum | None, str | None]:
+    """Return a read-only map from each member of an enum to its reported value.
+
+    Members map to their interned lowercase name, except UNKNOWN members,
+    which map to None like a missing value does.
+    """
+    names: dict[Enum | None, str | None] = {None: None}
+    for member in enum_type:
+        names[member] = (
+            None if member.name == "UNKNOWN" else sys.intern(member.name.lower())
+        )
+    return MappingProxyType(names)
 
 
 def _enum_to_lowercase(enum_value: Enum | None) -> str | None:
-    """Convert an enum value to a lowercase string."""
-    if enum_value == "unknown":
+    """Convert an enum value to a lowercase string, or None if unknown."""
+    if enum_value is None:
         return None
-    return enum_value.name.lower() if enum_value is not None else None
+    return _enum_names(type(enum_value))[enum_value]
+
+
+# The sensors exposed for each victron-ble data class, in emission order.
+_SENSORS: dict[type[DeviceData], tuple[_SensorField, ...]] = {
+    AcChargerData: (
+        _enum_sensor(Keys.CHARGE_STATE, AcChargerData.get_charge_state, OperationMode),
+        _enum_sensor(Keys.CHARGER_ERROR, AcChargerData.get_charger_error, ChargerError),
+        _voltage_sensor(Keys.OUTPUT_VOLTAGE_1, AcChargerData.get_output_voltage1),
+        _current_sensor(Keys.OUTPUT_CURRENT_1, AcChargerData.get_output_current1),
+        _voltage_sensor(Keys.OUTPUT_VOLTAGE_2, AcChargerData.get_output_voltage2),
+        _current_sensor(Keys.OUTPUT_CURRENT_2, AcChargerData.get_output_current2),
+        _voltage_sensor(Keys.OUTPUT_VOLTAGE_3, AcChargerData.get_output_voltage3),
+        _current_sensor(Keys.OUTPUT_CURRENT_3, AcChargerData.get_output_current3),
+        _temperature_sensor(Keys.TEMPERATURE, AcChargerData.get_temperature),
+        _current_sensor(Keys.AC_CURRENT, AcChargerData.get_ac_current),
+    ),
+    BatteryMonitorData: (
+        _sensor(
+            Keys.REMAINING_MINUTES,
+            BatteryMonitorData.get_remaining_mins,
+            Units.TIME_MINUTES,
+            SensorDeviceClass.DURATION,
+        ),
+        _current_sensor(Keys.CURRENT, BatteryMonitorData.get_current),
+        _voltage_sensor(Keys.VOLTAGE, BatteryMonitorData.get_voltage),
+        _sensor(
+            Keys.STATE_OF_CHARGE,
+            BatteryMonitorData.get_soc,
+            Units.PERCENTAGE,
+            SensorDeviceClass.BATTERY,
+        ),
+        _sensor(
+            Keys.CONSUMED_AMPERE_HOURS,
+            BatteryMonitorData.get_consumed_ah,
+            Units.ELECTRIC_CURRENT_FLOW_AMPERE_HOUR,
+            SensorDeviceClass.CURRENT_FLOW,
+        ),
+        _enum_sensor(Keys.ALARM, BatteryMonitorData.get_alarm, AlarmReason),
+        _enum_sensor(Keys.AUX_MODE, BatteryMonitorData.get_aux_mode, AuxMode),
+        _temperature_sensor(Keys.TEMPERATURE, BatteryMonitorData.get_temperature),
+        _voltage_sensor(Keys.STARTER_VOLTAGE, BatteryMonitorData.get_starter_voltage),
+        _voltage_sensor(Keys.MIDPOINT_VOLTAGE, BatteryMonitorData.get_midpoint_voltage),
+    ),
+    BatterySenseData: (
+        _voltage_sensor(Keys.VOLTAGE, BatterySenseData.get_voltage),
+        _temperature_sensor(Keys.TEMPERATURE, BatterySenseData.get_temperature),
+    ),
+    DcDcConverterData: (
+        _enum_sensor(
+            Keys.CHARGE_STATE, DcDcConverterData.get_charge_state, OperationMode
+        ),
+        _enum_sensor(
+            Keys.CHARGER_ERROR, DcDcConverterData.get_charger_error, ChargerError
+        ),
+        _voltage_sensor(Keys.INPUT_VOLTAGE, DcDcConverterData.get_input_voltage),
+        _enum_sensor(Keys.OFF_REASON, DcDcConverterData.get_off_reason, OffReason),
+        _voltage_sensor(Keys.OUTPUT_VOLTAGE, DcDcConverterData.get_output_voltage),
+    ),
+    DcEnergyMeterData: (
+        _enum_sensor(Keys.METER_TYPE, DcEnergyMeterData.get_meter_type, MeterType),
+        _current_sensor(Keys.CURRENT, DcEnergyMeterData.get_current),
+        _voltage_sensor(Keys.VOLTAGE, DcEnergyMeterData.get_voltage),
+        _enum_sensor(Keys.ALARM, DcEnergyMeterData.get_alarm, AlarmReason),
+        _temperature_sensor(Keys.TEMPERATURE, DcEnergyMeterData.get_temperature),
+        _enum_sensor(Keys.AUX_MODE, DcEnergyMeterData.get_aux_mode, AuxMode),
+        _voltage_sensor(Keys.STARTER_VOLTAGE, DcEnergyMeterData.get_starter_voltage),
+    ),
+    InverterData: (
+        _enum_sensor(Keys.DEVICE_STATE, InverterData.get_device_state, OperationMode),
+        _enum_sensor(Keys.ALARM, InverterData.get_alarm, AlarmReason),
+        _voltage_sensor(Keys.BATTERY_VOLTAGE, InverterData.get_battery_voltage),
+        _voltage_sensor(Keys.AC_VOLTAGE, InverterData.get_ac_voltage),
+        _current_sensor(Keys.AC_CURRENT, InverterData.get_ac_current),
+        _sensor(
+            Keys.AC_APPARENT_POWER,
+            InverterData.get_ac_apparent_power,
+            Units.POWER_VOLT_AMPERE,
+            SensorDeviceClass.APPARENT_POWER,
+        ),
+    ),
+    OrionXSData: (
+        _enum_sensor(Keys.CHARGE_STATE, OrionXSData.get_charge_state, OperationMode),
+        _enum_sensor(Keys.CHARGER_ERROR, OrionXSData.get_charger_error, ChargerError),
+        _voltage_sensor(Keys.INPUT_VOLTAGE, OrionXSData.get_input_voltage),
+        _current_sensor(Keys.INPUT_CURRENT, OrionXSData.get_input_current),
+        _voltage_sensor(Keys.OUTPUT_VOLTAGE, OrionXSData.get_output_voltage),
+        _current_sensor(Keys.OUTPUT_CURRENT, OrionXSData.get_output_current),
+        _enum_sensor(Keys.OFF_REASON, OrionXSData.get_off_reason, OffReason),
+    ),
+    SmartBatteryProtectData: (
+        _enum_sensor(
+            Keys.DEVICE_STATE, SmartBatteryProtectData.get_device_state, OperationMode
+        ),
+        _enum_sensor(
+            Keys.OUTPUT_STATE, SmartBatteryProtectData.get_output_state, OutputState
+        ),
+        _enum_sensor(
+            Keys.ERROR_CODE, SmartBatteryProtectData.get_error_code, ChargerError
+        ),
+        _enum_sensor(Keys.ALARM, SmartBatteryProtectData.get_alarm_reason, AlarmReason),
+        _enum_sensor(
+            Keys.WARNING, SmartBatteryProtectData.get_warning_reason, AlarmReason
+        ),
+        _enum_sensor(
+            Keys.OFF_REASON, SmartBatteryProtectData.get_off_reason, OffReason
+        ),
+        _voltage_sensor(Keys.INPUT_VOLTAGE, SmartBatteryProtectData.get_input_voltage),
+        _voltage_sensor(
+            Keys.OUTPUT_VOLTAGE, SmartBatteryProtectData.get_output_voltage
+        ),
+    ),
+    SmartLithiumData: (
+        _voltage_sensor(Keys.BATTERY_VOLTAGE, SmartLithiumData.get_battery_voltage),
+        _temperature_sensor(
+            Keys.BATTERY_TEMPERATURE, SmartLithiumData.get_battery_temperature
+        ),
+        _enum_sensor(
+            Keys.BALANCER_STATUS, SmartLithiumData.get_balancer_status, BalancerStatus
+        ),
+        *(
+            _voltage_sensor(Keys(f"cell_{i + 1}_voltage"), _cell_voltage_getter(i))
+            for i in range(8)
+        ),
+    ),
+    SolarChargerData: (
+        _enum_sensor(
+            Keys.CHARGE_STATE, SolarChargerData.get_charge_state, OperationMode
+        ),
+        _enum_sensor(
+            Keys.CHARGER_ERROR, SolarChargerData.get_charger_error, ChargerError
+        ),
+        _voltage_sensor(Keys.BATTERY_VOLTAGE, SolarChargerData.get_battery_voltage),
+        _current_sensor(
+            Keys.BATTERY_CURRENT, SolarChargerData.get_battery_charging_current
+        ),
+        _sensor(
+            Keys.YIELD_TODAY,
+            SolarChargerData.get_yield_today,
+            Units.ENERGY_WATT_HOUR,
+            SensorDeviceClass.ENERGY,
+        ),
+        _power_sensor(Keys.SOLAR_POWER, SolarChargerData.get_solar_power),
+        _current_sensor(
+            Keys.EXTERNAL_DEVICE_LOAD, SolarChargerData.get_external_device_load
+        ),
+    ),
+    VEBusData: (
+        _enum_sensor(Keys.DEVICE_STATE, VEBusData.get_device_state, OperationMode),
+        _enum_sensor(Keys.AC_IN_STATE, VEBusData.get_ac_in_state, ACInState),
+        _power_sensor(Keys.AC_IN_POWER, VEBusData.get_ac_in_power),
+        _power_sensor(Keys.AC_OUT_POWER, VEBusData.get_ac_out_power),
+        _current_sensor(Keys.BATTERY_CURRENT, VEBusData.get_battery_current),
+        _voltage_sensor(Keys.BATTERY_VOLTAGE, VEBusData.get_battery_voltage),
+        _temperature_sensor(
+            Keys.BATTERY_TEMPERATURE, VEBusData.get_battery_temperature
+        ),
+        _sensor(
+            Keys.STATE_OF_CHARGE,
+            VEBusData.get_soc,
+            Units.PERCENTAGE,
+            SensorDeviceClass.BATTERY,
+        ),
+    ),
+}
+
+# Supported device parsers mapped straight to the sensors of their data type,
+# so dispatching a packet costs one dict lookup whatever the device.
+_DEVICE_SENSORS: dict[type[Device], tuple[_SensorField, ...]] = {
+    parser: _SENSORS[parser.data_type]
+    for parser in (
+        AcCharger,
+        BatteryMonitor,
+        BatterySense,
+        DcDcConverter,
+        DcEnergyMeter,
+        Inverter,
+        OrionXS,
+        SmartBatteryProtect,
+        SmartLithium,
+        SolarCharger,
+        VEBus,
+    )
+}
+
+# Sensors computed from the decoded values when derived_metrics is enabled
+_CELL_VOLTAGE_KEYS = tuple(
+    DeviceKey(Keys(f"cell_{i + 1}_voltage"), None) for i in range(8)
+)
+# Smart Lithium cell voltages are decoded in steps of 0.01 V
+_CELL_VOLTAGE_DECIMALS = 2
+# Battery voltage in 0.01 V times current in 0.001 A
+_BATTERY_POWER = _DerivedSensors(
+    (_power_sensor(Keys.POWER, _computed),),
+    _power_compute(5, (Keys.VOLTAGE, Keys.CURRENT)),
+)
+_DERIVED_SENSORS: dict[type[DeviceData], _DerivedSensors] = {
+    BatteryMonitorData: _BATTERY_POWER,
+    DcEnergyMeterData: _BATTERY_POWER,
+    OrionXSData: _DerivedSensors(
+        (
+            _power_sensor(Keys.INPUT_POWER, _computed),
+            _power_sensor(Keys.OUTPUT_POWER, _computed),
+        ),
+        # voltages in 0.01 V times currents in 0.1 A
+        _power_compute(
+            3,
+            (Keys.INPUT_VOLTAGE, Keys.INPUT_CURRENT),
+            (Keys.OUTPUT_VOLTAGE, Keys.OUTPUT_CURRENT),
+        ),
+    ),
+    SmartLithiumData: _DerivedSensors(
+        (
+            _voltage_sensor(Keys.MIN_CELL_VOLTAGE, _computed),
+            _voltage_sensor(Keys.MAX_CELL_VOLTAGE, _computed),
+            _voltage_sensor(Keys.CELL_VOLTAGE_DELTA, _computed),
+        ),
+        _cell_statistics,
+    ),
+}
+# Running integrals over time and the sensor each one integrates
+_INTEGRALS = (
+    (
+        _sensor(
+            Keys.NET_AMPERE_HOURS,
+            _computed,
+            Units.ELECTRIC_CURRENT_FLOW_AMPERE_HOUR,
+            SensorDeviceClass.CURRENT_FLOW,
+        ),
+        DeviceKey(Keys.CURRENT, None),
+    ),
+    (
+        _sensor(
+            Keys.NET_ENERGY, _computed, Units.ENERGY_WATT_HOUR, SensorDeviceClass.ENERGY
+        ),
+        DeviceKey(Keys.POWER, None),
+    ),
+)
+# Running totals, which aggregation reports by their last value, not the mean
+_CUMULATIVE_SENSORS = frozenset(
+    (DeviceKey(Keys.YIELD_TODAY, None), *(field.device_key for field, _ in _INTEGRALS))
+)
+
+# Readout types and overridden model ids that detect_device_type() maps to a
+# supported parser, for _is_candidate()
+_SUPPORTED_READOUT_TYPES = frozenset(
+    readout_type
+    for readout_type in range(256)
+    if detect_device_type(bytes((0x10, 0, 0xFF, 0xFF, readout_type))) in _DEVICE_SENSORS
+)
+_SUPPORTED_MODEL_OVERRIDES: dict[int, bool] = {
+    model_id: parser in _DEVICE_SENSORS
+    for model_id, parser in MODEL_PARSER_OVERRIDE.items()
+}
@@ -0,0 +1,427 @@
+"""Synthetic encrypted Victron advertisements for load and scaling tests.
+
+Every device type VictronBluetoothDeviceData supports has a record layout
+here, matching the bit fields victron-ble decodes. Simulated devices keep
+their raw field values and drift them a little with each reading, bump the
+IV like real devices do, and encrypt the record with their own key. Because
+AES-CTR only XORs a keystream into the payload, the parser's _decrypt()
+encrypts a plaintext record as well as it decrypts one.
+"""
+
+import random
+import time
+
+from collections.abc import Iterable, Iterator
+from typing import NamedTuple
+
+from home_assistant_bluetooth import BluetoothServiceInfo
+
+from victron_ble.devices import (
+    AcCharger,
+    BatteryMonitor,
+    BatterySense,
+    DcDcConverter,
+    DcEnergyMeter,
+    Inverter,
+    OrionXS,
+    SmartBatteryProtect,
+    SmartLithium,
+    SolarCharger,
+    VEBus,
+)
+from victron_ble.devices.base import (
+    ACInState,
+    AdvertisementContainer,
+    AlarmNotification,
+    AlarmReason,
+    ChargerError,
+    Device,
+    OffReason,
+    OperationMode,
+)
+from victron_ble.devices.dc_energy_meter import MeterType
+from victron_ble.devices.smart_battery_protect import OutputState
+from victron_ble.devices.smart_lithium import BalancerStatus
+
+from .parser import (
+    _DEVICE_SENSORS,
+    _HEADER,
+    VICTRON_IDENTIFIER,
+    _decode_advertisement_key,
+    _decrypt,
+)
+
+# Record prefix of an instant readout advertisement
+_PREFIX = 0x0010
+
+# Chance that an enum field takes a new value with each reading
+_ENUM_CHANGE_PROBABILITY = 0.05
+
+
+class _Field(NamedTuple):
+    """A bit field of a record: a raw value range, or the raw enum values."""
+
+    bits: int
+    low: int = 0
+    high: int = 0
+    choices: tuple[int, ...] = ()
+
+
+class _Layout(NamedTuple):
+    """The header values and plaintext bit fields of a device type."""
+
+    model_id: int
+    readout_type: int
+    fields: tuple[_Field, ...]
+
+
+def _enum(bits: int, values: Iterable[int]) -> _Field:
+    """Describe an enum field, leaving out its "not available" raw value."""
+    mask = (1 << bits) - 1
+    return _Field(bits, choices=tuple(v for v in values if v & mask != mask))
+
+
+_OPERATION_MODE = _enum(8, (mode.value for mode in OperationMode))
+_CHARGER_ERROR = _enum(8, (error.value for error in ChargerError))
+_ALARM_REASON = _enum(16, (reason.value for reason in AlarmReason))
+_OFF_REASON = _enum(32, (reason.value for reason in OffReason))
+_BATTERY_VOLTAGE = _Field(16, 1150, 1450)
+
+_BATTERY_MONITOR = (
+    _Field(16, 0, 6000),  # remaining minutes
+    _BATTERY_VOLTAGE,
+    _ALARM_REASON,
+    _Field(16, 1150, 1450),  # starter or midpoint voltage
+    _Field(2, choices=(0, 1, 3)),  # aux mode: starter, midpoint, disabled
+    _Field(22, -50000, 50000),  # current, mA
+    _Field(20, 0, 2000),  # consumed, 0.1 Ah
+    _Field(10, 0, 1000),  # state of charge, 0.1 %
+)
+# A battery sense always reports its temperature on the aux input
+_BATTERY_SENSE = (
+    *_BATTERY_MONITOR[:3],
+    _Field(16, 27315, 31315),  # temperature, 0.01 K
+    _Field(2, choices=(2,)),  # aux mode: temperature
+    *_BATTERY_MONITOR[5:],
+)
+
+_LAYOUTS: dict[type[Device], _Layout] = {
+    AcCharger: _Layout(
+        0xA330,
+        0x08,
+        (
+            _OPERATION_MODE,
+            _CHARGER_ERROR,
+            *((_Field(13, 1200, 1450), _Field(11, 0, 300)) * 3),
+            _Field(7, 40, 90),  # temperature, +40 °C
+            _Field(9, 0, 160),  # AC current, 0.1 A
+        ),
+    ),
+    BatteryMonitor: _Layout(0xA389, 0x02, _BATTERY_MONITOR),
+    BatterySense: _Layout(0xA3A4, 0x02, _BATTERY_SENSE),
+    DcDcConverter: _Layout(
+        0xA3C0,
+        0x04,
+        (
+            _OPERATION_MODE,
+            _CHARGER_ERROR,
+            _Field(16, 1150, 1450),  # input voltage
+            _Field(16, 1200, 1450),  # output voltage
+            _OFF_REASON,
+        ),
+    ),
+    # A SmartShunt set up as a DC energy meter, like the test fixture
+    DcEnergyMeter: _Layout(
+        0xA389,
+        0x0D,
+        (
+            _enum(16, (meter_type.value for meter_type in MeterType)),
+            _BATTERY_VOLTAGE,
+            _ALARM_REASON,
+            _Field(16, 1150, 1450),  # starter voltage
+            _Field(2, choices=(0, 3)),  # aux mode: starter, disabled
+            _Field(22, -50000, 50000),  # current, mA
+        ),
+    ),
+    Inverter: _Layout(
+        0xA264,
+        0x03,
+        (
+            _OPERATION_MODE,
+            _ALARM_REASON,
+            _BATTERY_VOLTAGE,
+            _Field(16, 0, 3000),  # AC apparent power, VA
+            _Field(15, 22000, 24000),  # AC voltage
+            _Field(11, 0, 150),  # AC current, 0.1 A
+        ),
+    ),
+    OrionXS: _Layout(
+        0xA3F0,
+        0x0F,
+        (
+            _OPERATION_MODE,
+            _CHARGER_ERROR,
+            _Field(16, 1200, 1450),  # output voltage
+            _Field(16, 0, 300),  # output current, 0.1 A
+            _Field(16, 1150, 1450),  # input voltage
+            _Field(16, 0, 300),  # input current, 0.1 A
+            _OFF_REASON,
+        ),
+    ),
+    SmartBatteryProtect: _Layout(
+        0xA3B0,
+        0x09,
+        (
+            _OPERATION_MODE,
+            _enum(8, (state.value for state in OutputState)),
+            _CHARGER_ERROR,
+            _ALARM_REASON,
+            _ALARM_REASON,  # warning reason
+            _BATTERY_VOLTAGE,  # input voltage
+            _Field(16, 1150, 1450),  # output voltage
+            _OFF_REASON,
+        ),
+    ),
+    SmartLithium: _Layout(
+        0xA0E5,
+        0x05,
+        (
+            _Field(32),  # BMS flags
+            _Field(16),  # error flags
+            *((_Field(7, 55, 80),) * 8),  # cell voltages, 2.60 V + 0.01 V
+            _Field(12, 1250, 1400),  # battery voltage
+            _enum(4, (status.value for status in BalancerStatus)),
+            _Field(7, 40, 80),  # temperature, +40 °C
+        ),
+    ),
+    SolarCharger: _Layout(
+        0xA042,
+        0x01,
+        (
+            _OPERATION_MODE,
+            _CHARGER_ERROR,
+            _Field(16, 1200, 1450),  # battery voltage
+            _Field(16, 0, 300),  # battery current, 0.1 A
+            _Field(16, 0, 500),  # yield today, 10 Wh
+            _Field(16, 0, 1000),  # solar power, W
+            _Field(9, 0, 100),  # external device load, 0.1 A
+        ),
+    ),
+    VEBus: _Layout(
+        0x2780,
+        0x0C,
+        (
+            _OPERATION_MODE,
+            _Field(8),  # VE.Bus error
+            _Field(16, -500, 500),  # battery current, 0.1 A
+            _Field(14, 1150, 1450),  # battery voltage
+            _enum(2, (state.value for state in ACInState)),
+            _Field(19, 0, 3000),  # AC in power, W
+            _Field(19, 0, 3000),  # AC out power, W
+            _enum(2, (alarm.value for alarm in AlarmNotification)),
+            _Field(7, 40, 80),  # battery temperature, +40 °C
+            _Field(7, 0, 100),  # state of charge, %
+        ),
+    ),
+}
+
+
+class SimulatedDevice:
+    """A Victron device sending encrypted advertisements of drifting readings."""
+
+    __slots__ = (
+        "address",
+        "advertisement_key",
+        "parser",
+        "_key",
+        "_layout",
+        "_rng",
+        "_values",
+        "_iv",
+        "last_advertisement",
+    )
+
+    def __init__(
+        self,
+        parser: type[Device],
+        address: str,
+        advertisement_key: str,
+        rng: random.Random | None = None,
+    ) -> None:
+        """Simulate a device of the type decoded by parser.
+
+        Raises ValueError if the device type is not supported or the key is
+        not a 128-bit hex string.
+        """
+        layout = _LAYOUTS.get(parser)
+        if layout is None or parser not in _DEVICE_SENSORS:
+            raise ValueError(f"Unsupported device type: {parser.__name__}")
+        self.address = address
+        self.advertisement_key = advertisement_key
+        self.parser = parser
+        self._key = _decode_advertisement_key(advertisement_key)
+        self._layout = layout
+        self._rng = rng or random.Random()
+        self._values = [
+            (
+                self._rng.choice(field.choices)
+                if field.choices
+                else self._rng.randint(field.low, field.high)
+            )
+            for field in layout.fields
+        ]
+        self._iv = self._rng.getrandbits(16)
+        self.last_advertisement: bytes | None = None
+
+    def advertisement(self) -> bytes:
+        """Return the manufacturer data of the next reading.
+
+        Each reading moves every field a small random step within its range,
+        or occasionally to another enum value, and uses the next IV.
+        """
+        rng = self._rng
+        values = self._values
+        record = 0
+        offset = 0
+        for index, field in enumerate(self._layout.fields):
+            if field.choices:
+                if rng.random() < _ENUM_CHANGE_PROBABILITY:
+                    values[index] = rng.choice(field.choices)
+            elif field.high > field.low:
+                step = max(1, (field.high - field.low) // 50)
+                values[index] = min(
+                    field.high, max(field.low, values[index] + rng.randint(-step, step))
+                )
+            record |= (values[index] & ((1 << field.bits) - 1)) << offset
+            offset += field.bits
+        plaintext = record.to_bytes((offset + 7) // 8, "little")
+
+        self._iv = (self._iv + 1) & 0xFFFF
+        layout = self._layout
+        check_byte = self._key[:1]
+        container = AdvertisementContainer(
+            prefix=_PREFIX,
+            model_id=layout.model_id,
+            readout_type=layout.readout_type,
+            iv=self._iv,
+            encrypted_data=check_byte + plaintext,
+        )
+        encrypted = _decrypt(container, self._key)[: len(plaintext)]
+        self.last_advertisement = (
+            _HEADER.pack(_PREFIX, layout.model_id, layout.readout_type, self._iv)
+            + check_byte
+            + encrypted
+        )
+        return self.last_advertisement
+
+
+class AdvertisementSimulator:
+    """Interleave the advertisements of many simulated devices.
+
+    Devices take turns, cycling through the requested device types. A
+    duplicate_ratio share of the packets repeat the device's previous
+    advertisement, as real devices do between readings, and a
+    malformed_ratio share are truncated or carry the wrong key check byte.
+    The same seed reproduces the same devices, keys and packets.
+    """
+
+    def __init__(
+        self,
+        devices: int = 10,
+        device_types: Iterable[type[Device]] | None = None,
+        duplicate_ratio: float = 0.0,
+        malformed_ratio: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        """Create the simulated devices, each with its own random key.
+
+        device_types defaults to every supported device type. Raises
+        ValueError if there are no devices or the ratios are not between 0
+        and 1 in total.
+        """
+        if devices <= 0:
+            raise ValueError("devices must be positive")
+        if (
+            duplicate_ratio < 0
+            or malformed_ratio < 0
+            or duplicate_ratio + malformed_ratio > 1
+        ):
+            raise ValueError(
+                "duplicate_ratio and malformed_ratio must sum to at most 1"
+            )
+        types = list(_DEVICE_SENSORS if device_types is None else device_types)
+        if not types:
+            raise ValueError("device_types must not be empty")
+        self._rng = random.Random(seed)
+        self._duplicate_ratio = duplicate_ratio
+        self._malformed_ratio = malformed_ratio
+        self.devices = [
+            SimulatedDevice(
+                types[index % len(types)],
+                f"C0:FF:EE:{index >> 16 & 0xFF:02X}:{index >> 8 & 0xFF:02X}"
+                f":{index & 0xFF:02X}",
+                self._rng.randbytes(16).hex(),
+                random.Random(self._rng.getrandbits(64)),
+            )
+            for index in range(devices)
+        ]
+        self._next_device = 0
+
+    def advertisement_keys(self) -> dict[str, str]:
+        """Return the advertisement key of every device by address."""
+        return {device.address: device.advertisement_key for device in self.devices}
+
+    def advertisements(self, count: int) -> Iterator[tuple[str, bytes]]:
+        """Yield count (address, manufacturer_data) pairs.
+
+        They can be passed to parse_advertisements() with the keys from
+        advertisement_keys().
+        """
+        rng = self._rng
+        devices = self.devices
+        duplicate_ratio = self._duplicate_ratio
+        malformed_ratio = self._malformed_ratio
+        for _ in range(count):
+            device = devices[self._next_device]
+            self._next_device = (self._next_device + 1) % len(devices)
+            roll = rng.random()
+            if roll < malformed_ratio:
+                data = device.advertisement()
+                if rng.random() < 0.5:
+                    data = data[: rng.randrange(1, _HEADER.size + 1)]
+                else:
+                    check_byte = bytes((data[_HEADER.size] ^ 0xFF,))
+                    data = data[: _HEADER.size] + check_byte + data[_HEADER.size + 1 :]
+            elif (
+                roll < malformed_ratio + duplicate_ratio
+                and device.last_advertisement is not None
+            ):
+                data = device.last_advertisement
+            else:
+                data = device.advertisement()
+            yield device.address, data
+
+    def service_infos(
+        self, count: int, rate: float | None = None
+    ) -> Iterator[BluetoothServiceInfo]:
+        """Yield count advertisements as Home Assistant would report them.
+
+        With a rate in packets per second, yielding is paced to that rate
+        on average; it falls behind silently when the consumer is slower.
+        """
+        start = time.monotonic()
+        rng = self._rng
+        for sent, (address, data) in enumerate(self.advertisements(count)):
+            if rate is not None:
+                delay = start + sent / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            yield BluetoothServiceInfo(
+                name=address,
+                address=address,
+                rssi=rng.randint(-90, -40),
+                manufacturer_data={VICTRON_IDENTIFIER: data},
+                service_data={},
+                service_uuids=[],
+                source="simulator",
+            )
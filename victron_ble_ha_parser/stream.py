@@ -0,0 +1,167 @@
+"""Asyncio ingest stage decoding advertisements off the event loop's hot path."""
+
+import asyncio
+
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Hashable
+from concurrent.futures import Executor
+from itertools import count
+from typing import NamedTuple
+
+from home_assistant_bluetooth import BluetoothServiceInfo
+from sensor_state_data import SensorUpdate
+from sensor_state_data.enum import StrEnum
+
+from .fleet import VictronBluetoothFleet
+
+
+class OverflowPolicy(StrEnum):
+    """What VictronAdvertisementStream does with advertisements when full."""
+
+    # put() waits for room and put_nowait() raises asyncio.QueueFull
+    BLOCK = "block"
+    # the oldest pending advertisement is discarded
+    DROP_OLDEST = "drop_oldest"
+    # a pending advertisement from the same address is replaced in place,
+    # otherwise the oldest pending advertisement is discarded
+    COALESCE = "coalesce"
+
+
+class StreamUpdate(NamedTuple):
+    """A sensor update decoded by VictronAdvertisementStream."""
+
+    address: str
+    update: SensorUpdate
+
+
+class VictronAdvertisementStream:
+    """Queue advertisements and decode them in batches as an async iterator.
+
+    Scanner callbacks hand advertisements to put_nowait() (or await put()),
+    and a single consumer iterates over the stream to receive StreamUpdates
+    in arrival order. Up to batch_size advertisements are decoded at a time;
+    batches of at least executor_batch_size are decoded in an executor so a
+    burst does not stall the event loop. Only the consumer touches the fleet
+    while the stream is being iterated.
+    """
+
+    def __init__(
+        self,
+        fleet: VictronBluetoothFleet,
+        maxsize: int = 1024,
+        overflow: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+        batch_size: int = 64,
+        executor_batch_size: int = 32,
+        executor: Executor | None = None,
+    ) -> None:
+        """Initialize the stream in front of a fleet of device parsers."""
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self._fleet = fleet
+        self._maxsize = maxsize
+        self._overflow = OverflowPolicy(overflow)
+        self._batch_size = batch_size
+        self._executor_batch_size = executor_batch_size
+        self._executor = executor
+        self._pending: OrderedDict[Hashable, BluetoothServiceInfo] = OrderedDict()
+        self._sequence = count()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._closed = False
+        self._dropped = 0
+
+    @property
+    def dropped(self) -> int:
+        """Return how many advertisements were discarded or coalesced away."""
+        return self._dropped
+
+    def __len__(self) -> int:
+        """Return the number of advertisements waiting to be decoded."""
+        return len(self._pending)
+
+    def put_nowait(self, data: BluetoothServiceInfo) -> None:
+        """Queue an advertisement, applying the overflow policy if full."""
+        if self._closed:
+            raise RuntimeError("Stream is closed")
+        pending = self._pending
+        if self._overflow is OverflowPolicy.COALESCE and data.address in pending:
+            pending[data.address] = data
+            self._dropped += 1
+            return
+        if len(pending) >= self._maxsize:
+            if self._overflow is OverflowPolicy.BLOCK:
+                raise asyncio.QueueFull
+            pending.popitem(last=False)
+            self._dropped += 1
+        if self._overflow is OverflowPolicy.COALESCE:
+            pending[data.address] = data
+        else:
+            pending[next(self._sequence)] = data
+        if len(pending) >= self._maxsize:
+            self._not_full.clear()
+        self._not_empty.set()
+
+    async def put(self, data: BluetoothServiceInfo) -> None:
+        """Queue an advertisement, waiting for room under OverflowPolicy.BLOCK."""
+        while self._overflow is OverflowPolicy.BLOCK and (
+            len(self._pending) >= self._maxsize
+        ):
+            await self._not_full.wait()
+        self.put_nowait(data)
+
+    def close(self) -> None:
+        """Stop accepting advertisements; iteration ends once drained."""
+        self._closed = True
+        self._not_empty.set()
+
+    async def __aiter__(self) -> AsyncIterator[StreamUpdate]:
+        """Decode queued advertisements in batches and yield their updates."""
+        loop = asyncio.get_running_loop()
+        pending = self._pending
+        while True:
+            if not pending:
+                if self._closed:
+                    return
+                self._not_empty.clear()
+                await self._not_empty.wait()
+                continue
+            batch = [
+                pending.popitem(last=False)[1]
+                for _ in range(min(self._batch_size, len(pending)))
+            ]
+            self._not_full.set()
+            if len(batch) >= self._executor_batch_size:
+                updates = await loop.run_in_executor(
+                    self._executor, self._decode, batch
+                )
+            else:
+                updates = self._decode(batch)
+            for update in updates:
+                yield update
+
+    def _decode(self, batch: list[BluetoothServiceInfo]) -> list[StreamUpdate]:
+        """Decode a batch, detaching each update from its parser's buffers."""
+        updates = []
+        for data in batch:
+            update = self._fleet.update(data)
+            if update is None:
+                continue
+            # The parser reuses its per-update dicts on the next advertisement
+            updates.append(
+                StreamUpdate(
+                    data.address,
+                    SensorUpdate(
+                        title=update.title,
+                        devices=dict(update.devices),
+                        entity_descriptions=dict(update.entity_descriptions),
+                        entity_values=dict(update.entity_values),
+                        binary_entity_descriptions=dict(
+                            update.binary_entity_descriptions
+                        ),
+                        binary_entity_values=dict(update.binary_entity_values),
+                        events=dict(update.events),
+                    ),
+                )
+            )
+        return updates